@@ -0,0 +1,41 @@
+"""
+Cost of attribute access and iteration on the guarded collections, vs the previous
+per-access `__getattribute__` check. Run with `python -m bench.access [items]`.
+"""
+
+import sys
+from functools import cache
+from timeit import timeit
+from typing import Any, Set
+
+from core.data.backend import MemoryBackend
+from core.data.handler import AtomicDBList
+from core.data.writable import UserTask
+
+
+class Intercepted(AtomicDBList[UserTask]):
+    """AtomicDBList as it was guarded before: a set lookup on every attribute."""
+
+    @staticmethod
+    @cache
+    def unsupported_methods() -> Set[str]:
+        return {"__delitem__", "__iadd__", "__imul__", "sort", "reverse"}
+
+    def __getattribute__(self, name: str) -> Any:
+        if name in Intercepted.unsupported_methods():
+            raise NotImplementedError(f"Method '{name}' not supported in AtomicDBList")
+        return super().__getattribute__(name)
+
+
+def run(items: int) -> None:
+    tasks = [UserTask(i, f"task {i}") for i in range(items)]
+    print(f"{'':>12} {'attr ns':>10} {'iterate us':>12}")
+    for name, cls in (("intercepted", Intercepted), ("class-time", AtomicDBList)):
+        user_tasks = cls(tasks, backend=MemoryBackend())
+        attr = timeit(lambda: user_tasks.version, number=100_000) * 1e4
+        iterate = timeit(lambda: [t.user_id for t in user_tasks], number=100) * 1e4
+        print(f"{name:>12} {attr:>10.1f} {iterate:>12.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,40 @@
+"""
+Mutation throughput of an AtomicDBList hammered by many threads, each working on its
+own user. Mutations are serialized on the backend's lock, as its session isn't thread
+safe, so this shows what that costs as threads are added. Run with
+`python -m bench.contention [ops per thread]`.
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from core.data.backend import MemoryBackend
+from core.data.handler import AtomicDBList
+from core.data.writable import UserTask
+
+
+def rate(threads: int, ops: int) -> float:
+    user_tasks = AtomicDBList[UserTask](backend=MemoryBackend())
+
+    def work(user: int) -> None:
+        tasks = [UserTask(user, f"task {i}") for i in range(ops)]
+        for task in tasks:
+            user_tasks.append(task)
+        for task in tasks:
+            user_tasks.discard(task)
+
+    start = perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(work, range(threads)))
+    return 2 * threads * ops / (perf_counter() - start)
+
+
+def run(ops: int) -> None:
+    print(f"{'threads':>8} {'op/s':>10}")
+    for threads in (1, 2, 4, 8, 16, 32):
+        print(f"{threads:>8} {rate(threads, ops):>10,.0f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,56 @@
+"""
+Bytes per reminder the Timer keeps in memory: the ORM objects DataHandler holds, plus
+the Schedule on top of them. The Schedule only refers to the tasks due within its
+paging window, so with reminders spread over a week it holds a small share of them.
+Run with `python -m bench.memory [reminders]`.
+"""
+
+import sys
+import tracemalloc
+from datetime import timedelta
+from typing import Callable, Tuple, TypeVar, cast
+
+from core.data.writable import PeriodicAlert
+from core.timer import Schedule, now
+
+T = TypeVar("T")
+
+
+def allocated(f: Callable[[], T]) -> Tuple[T, int]:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    res = f()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return res, sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+def run(n: int) -> None:
+    start = now()
+    alerts, orm_bytes = allocated(
+        lambda: [
+            PeriodicAlert(
+                f"reminder {i}", i, i, timedelta(days=7), start + timedelta(minutes=i)
+            )
+            for i in range(n)
+        ]
+    )
+
+    def build() -> Schedule:
+        schedule = Schedule()
+        horizon = start.timestamp() + Schedule.window
+        schedule.rebuild(
+            [x for x in alerts if cast(float, x._next_activation) < horizon],
+            (0, 0),
+            horizon,
+        )
+        return schedule
+
+    _, schedule_bytes = allocated(build)
+    print(f"ORM objects: {orm_bytes / n:>8,.0f} bytes per reminder")
+    print(f"Schedule:    {schedule_bytes / n:>8,.0f} bytes per reminder")
+    print(f"Total:       {(orm_bytes + schedule_bytes) / n:>8,.0f} bytes per reminder")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,39 @@
+"""
+Time and peak traced memory per message of ArgParser.parse_message over a corpus of
+commands, typos and chatter, without and with its cache of parsed messages. Run with
+`python -m bench.parse [rounds]`.
+"""
+
+import sys
+import tracemalloc
+from timeit import timeit
+
+from core.command_processor import CommandProcessor
+from core.utils.parse import lex
+from disc.tests.corpus import corpus, parse_all
+
+
+def run(rounds: int) -> None:
+    parser = CommandProcessor().arg_parser
+    for name, f in (
+        ("all commands", lambda msg: parse_all(parser, msg)),
+        ("uncached", lambda msg: parser.dispatch(lex(msg), {}, {})),
+        ("parse_message", parser.parse_message),
+    ):
+        t = timeit(lambda: [f(msg) for msg in corpus], number=rounds)
+        peak = 0
+        tracemalloc.start()
+        for msg in corpus:
+            tracemalloc.reset_peak()
+            f(msg)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        print(
+            f"{name:>14} {t / rounds / len(corpus) * 1e6:>10.1f} us/message "
+            f"{peak / 1024:>8.1f} KiB peak"
+        )
+    print(f"{'hit rate':>14} {parser.hit_rate():>10.1%}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,67 @@
+"""
+SQL statements issued per wakeup/timezone change: deleting the old row and inserting
+the new one, against `replace` updating the changed columns in place.
+Run with `python -m bench.statements [ops]`.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import time as Time
+from typing import Any, Callable
+
+from sqlalchemy import event
+
+from core.data.backend import SQLiteBackend
+from core.data.writable import Timezone, Wakeup
+
+
+def statements(backend: SQLiteBackend, f: Callable[[], None]) -> int:
+    count = 0
+
+    def on_execute(*_: Any) -> None:
+        nonlocal count
+        count += 1
+
+    event.listen(backend.engine, "before_cursor_execute", on_execute)
+    f()
+    event.remove(backend.engine, "before_cursor_execute", on_execute)
+    return count
+
+
+def run(ops: int) -> None:
+    backend = SQLiteBackend(os.path.join(tempfile.mkdtemp(), "data.db"))
+    wakeup = Wakeup(0, Time(hour=10), 0)
+    timezone = Timezone(0, "US/Eastern")
+    backend.add(wakeup)
+    backend.add(timezone)
+    backend.commit()
+
+    def delete_insert() -> None:
+        nonlocal wakeup, timezone
+        for i in range(ops):
+            backend.delete(wakeup)
+            backend.add(wakeup := Wakeup(0, Time(hour=10), 0, disabled=i % 2 == 0))
+            backend.commit()
+            backend.delete(timezone)
+            backend.add(timezone := Timezone(0, ("US/Pacific", "US/Eastern")[i % 2]))
+            backend.commit()
+
+    def replace() -> None:
+        nonlocal wakeup, timezone
+        for i in range(ops):
+            backend.replace(
+                wakeup, wakeup := Wakeup(0, Time(hour=10), 0, disabled=i % 2 == 0)
+            )
+            backend.commit()
+            backend.replace(
+                timezone, timezone := Timezone(0, ("US/Pacific", "US/Eastern")[i % 2])
+            )
+            backend.commit()
+
+    for name, f in (("delete + insert", delete_insert), ("replace", replace)):
+        print(f"{name:>16}: {statements(backend, f) / (2 * ops):.2f} statements/op")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
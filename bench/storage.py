@@ -0,0 +1,58 @@
+"""
+Throughput of AtomicDBList/AtomicDBDict mutations on each storage backend.
+Run with `python -m bench.storage [ops]`.
+"""
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+from typing import Callable, List, Tuple
+
+from core.data.backend import MemoryBackend, SQLAlchemyBackend, SQLiteBackend
+from core.data.handler import AtomicDBDict, AtomicDBList
+from core.data.writable import Timezone, UserTask
+from custom_typing.protocols import StorageBackend
+
+
+def backends() -> List[Tuple[str, StorageBackend]]:
+    return [
+        ("memory", MemoryBackend()),
+        ("sqlite", SQLiteBackend(os.path.join(tempfile.mkdtemp(), "data.db"))),
+        ("url", SQLAlchemyBackend("sqlite://")),
+    ]
+
+
+def rate(ops: int, f: Callable[[], None]) -> float:
+    start = perf_counter()
+    f()
+    return ops / (perf_counter() - start)
+
+
+def run(ops: int) -> None:
+    print(f"{'backend':>8} {'append/s':>12} {'remove/s':>12} {'dict set/s':>12}")
+    for name, backend in backends():
+        user_tasks = AtomicDBList[UserTask](backend=backend)
+        timezones = AtomicDBDict[int, Timezone](tz=True, backend=backend)
+        tasks = [UserTask(i, f"task {i}") for i in range(ops)]
+
+        def append() -> None:
+            for task in tasks:
+                user_tasks.append(task)
+
+        def remove() -> None:
+            for task in tasks:
+                user_tasks.remove(task)
+
+        def set_tz() -> None:
+            for i in range(ops):
+                timezones[i % 100] = Timezone(i % 100, "US/Eastern")
+
+        print(
+            f"{name:>8} {rate(ops, append):>12,.0f} {rate(ops, remove):>12,.0f} "
+            f"{rate(ops, set_tz):>12,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -1,12 +1,14 @@
 from core.timer import now
 from disc.tests.main import Test
 from datetime import timedelta
+from disc.receive import command_processor
 from disc.tests.utils import (
     get_messages_at_time,
+    messages,
     query_message_with_reaction,
     user_says,
 )
-from core.utils.constants import todo_emoji, testmogus_id
+from core.utils.constants import todo_emoji, testmogus_id, warning_emoji
 
 
 class TestManageReminder(Test):
@@ -30,3 +32,17 @@ class TestManageReminder(Test):
                 "your todo list."
             ),
         )
+
+    async def test_warning_reaction(self) -> None:
+        parser = command_processor.arg_parser
+        await user_says("in 5 minutes", expected_responses=0)
+        warned = messages[-1]
+        self.assert_equal(warned.reactions[0].emoji, warning_emoji)
+
+        hits = parser.hits
+        response = await query_message_with_reaction(
+            warning_emoji, warned, expected_messages=1
+        )
+        self.assert_equal(response.content, "Ran out of tokens while parsing.")
+        # the reparse of the warned message comes from the cache
+        self.assert_equal(parser.hits, hits + 1)
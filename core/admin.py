@@ -0,0 +1,233 @@
+"""
+Offline maintenance of a fortmogos database, without connecting to discord or loading
+everything into memory. Stop the bot before anything that writes.
+
+    python -m core.admin [--db data.db] counts [--by-user]
+    python -m core.admin top [-n 10]
+    python -m core.admin due [--hours 48] [--bucket 3600]
+    python -m core.admin check
+    python -m core.admin purge USER [--yes]
+    python -m core.admin vacuum
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime as dt, timedelta
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import create_engine, inspect, text
+
+from core.data.backend import task_schedule_sql
+from core.data.base import Base
+from core.data.writable import Alert, SingleAlert, Task
+from core.timer import now
+
+# the column holding the owning user, for tables where it isn't `user`
+user_columns = {"user_task": "user_id", "timezone": "_id"}
+
+
+def stream(conn: Any, sql: str, **params: Any) -> Iterator[Any]:
+    """Rows one at a time rather than fetching everything first."""
+    yield from conn.execution_options(stream_results=True, yield_per=1000).execute(
+        text(sql), params
+    )
+
+
+def tables(conn: Any) -> List[str]:
+    existing = set(inspect(conn).get_table_names())
+    return [
+        table.name
+        for table in Base.metadata.sorted_tables  # type: ignore
+        if table.name in existing
+    ]
+
+
+def tables_of(conn: Any, cls: type) -> List[str]:
+    existing = set(tables(conn))
+    return [
+        mapper.class_.__tablename__
+        for mapper in Base.registry.mappers  # type: ignore
+        if issubclass(mapper.class_, cls) and mapper.class_.__tablename__ in existing
+    ]
+
+
+def user_column(table: str) -> str:
+    return user_columns.get(table, "user")
+
+
+def counts(conn: Any, by_user: bool) -> int:
+    for table in tables(conn):
+        if not by_user:
+            n = conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+            print(f"{table:<20} {n:>10}")
+            continue
+        col = user_column(table)
+        for user, n in stream(
+            conn, f'SELECT "{col}", count(*) FROM {table} GROUP BY "{col}"'
+        ):
+            print(f"{table:<20} {user:>20} {n:>10}")
+    return 0
+
+
+def top(conn: Any, n: int) -> int:
+    union = " UNION ALL ".join(f"SELECT user FROM {t}" for t in tables_of(conn, Alert))
+    if not union:
+        return 0
+    for user, reminders in stream(
+        conn,
+        f"SELECT user, count(*) AS n FROM ({union}) GROUP BY user "
+        "ORDER BY n DESC LIMIT :n",
+        n=n,
+    ):
+        print(f"{user:>20} {reminders:>10}")
+    return 0
+
+
+def due(conn: Any, hours: float, bucket: int) -> int:
+    """How many tasks go off in each `bucket` seconds over the next `hours`."""
+    start = now().timestamp()
+    for slot, n in stream(
+        conn,
+        f"SELECT CAST(next_activation / {bucket} AS INTEGER) AS slot, count(*) "
+        f"FROM ({task_schedule_sql()}) "
+        "WHERE next_activation >= :start AND next_activation < :end "
+        "GROUP BY slot ORDER BY slot",
+        start=start,
+        end=start + hours * 3600,
+    ):
+        print(f"{dt.fromtimestamp(slot * bucket)} {n:>8} {'#' * min(n, 60)}")
+    return 0
+
+
+def check(conn: Any) -> int:
+    """Prints every inconsistency found; exits non-zero if there were any."""
+    existing = set(tables(conn))
+    alerts = tables_of(conn, Alert)
+    union = " UNION ALL ".join(
+        f"SELECT '{t}' AS kind, user, msg, _next_activation FROM {t}" for t in alerts
+    )
+    missed = (now() - timedelta(minutes=1)).timestamp()
+    checks: List[Tuple[str, str]] = [
+        (
+            f"{t} rows without _next_activation",
+            f'SELECT "_Task__id" FROM {t} WHERE _next_activation IS NULL',
+        )
+        for t in tables_of(conn, Task)
+    ]
+    if union:
+        checks.append(
+            (
+                "identical alerts",
+                f"SELECT user, msg, _next_activation, count(*) FROM ({union}) "
+                "GROUP BY user, msg, _next_activation HAVING count(*) > 1",
+            )
+        )
+        if "timezone" in existing:
+            checks.append(
+                (
+                    "users with alerts but no timezone",
+                    f"SELECT DISTINCT user FROM ({union}) "
+                    "WHERE user NOT IN (SELECT _id FROM timezone)",
+                )
+            )
+    if "wakeup" in existing:
+        checks.append(
+            (
+                "users with several wakeups",
+                "SELECT user, count(*) FROM wakeup GROUP BY user HAVING count(*) > 1",
+            )
+        )
+    if SingleAlert.__tablename__ in existing:
+        checks.append(
+            (
+                "single alerts that were missed and will never be sent",
+                f'SELECT "_Task__id", user FROM {SingleAlert.__tablename__} '
+                f"WHERE _activation < {missed}",
+            )
+        )
+
+    problems = 0
+    for name, sql in checks:
+        rows = 0
+        for row in stream(conn, sql):
+            if rows < 10:
+                print(f"{name}: {tuple(row)}")
+            rows += 1
+        if rows:
+            print(f"{name}: {rows} total")
+        problems += rows
+    print("ok" if not problems else f"{problems} problems")
+    return 1 if problems else 0
+
+
+def purge(conn: Any, user: int) -> int:
+    """Deletes everything belonging to `user`, in one transaction."""
+    for table in tables(conn):
+        res = conn.execute(
+            text(f'DELETE FROM {table} WHERE "{user_column(table)}" = :user'),
+            {"user": user},
+        )
+        if res.rowcount:
+            print(f"{table:<20} {res.rowcount:>10}")
+    if "activation_history" in inspect(conn).get_table_names():
+        conn.execute(
+            text("DELETE FROM activation_history WHERE user = :user"), {"user": user}
+        )
+    return 0
+
+
+def vacuum(engine: Any, path: str) -> int:
+    before = os.path.getsize(path)
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("VACUUM"))
+        conn.execute(text("ANALYZE"))
+        conn.execute(text("PRAGMA optimize"))
+    print(f"{before:,} -> {os.path.getsize(path):,} bytes")
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.admin")
+    parser.add_argument("--db", default="data.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("counts").add_argument("--by-user", action="store_true")
+    commands.add_parser("top").add_argument("-n", type=int, default=10)
+    due_parser = commands.add_parser("due")
+    due_parser.add_argument("--hours", type=float, default=48)
+    due_parser.add_argument("--bucket", type=int, default=3600, help="seconds")
+    commands.add_parser("check")
+    purge_parser = commands.add_parser("purge")
+    purge_parser.add_argument("user", type=int)
+    purge_parser.add_argument("--yes", action="store_true")
+    commands.add_parser("vacuum")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"{args.db} doesn't exist", file=sys.stderr)
+        return 2
+    engine = create_engine(f"sqlite:///{args.db}")
+    try:
+        if args.command == "vacuum":
+            return vacuum(engine, args.db)
+        if args.command == "purge":
+            if not args.yes:
+                print(f"This deletes everything of {args.user}, pass --yes to do it.")
+                return 1
+            with engine.begin() as conn:
+                return purge(conn, args.user)
+        with engine.connect() as conn:
+            if args.command == "counts":
+                return counts(conn, args.by_user)
+            if args.command == "top":
+                return top(conn, args.n)
+            if args.command == "due":
+                return due(conn, args.hours, args.bucket)
+            return check(conn)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,153 @@
+"""
+Storage backends underneath AtomicDBList/AtomicDBDict. Anything implementing
+`custom_typing.protocols.StorageBackend` works; these are the ones we ship.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, List
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import class_mapper, make_transient_to_detached, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from core.data.base import Base
+from core.data.migrations import Migrator
+from core.utils.walk import subclasses_of
+
+
+def task_schedule_sql() -> str:
+    """(kind, id, user, next_activation) of every task, across all task tables."""
+    from core.data.writable import Task
+
+    selects: List[str] = [
+        f"SELECT '{subcls.__tablename__}' AS kind, \"_Task__id\" AS id, "
+        f"user, _next_activation AS next_activation FROM {subcls.__tablename__}"
+        for subcls in subclasses_of(Task)
+        if hasattr(subcls, "__tablename__")
+    ]
+    return " UNION ALL ".join(selects)
+
+
+def create_task_schedule_view(engine: Any) -> None:
+    """
+    `task_schedule` unifies every task table into (kind, id, user, next_activation),
+    so due tasks can be found with a single range query on the indexed column.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("DROP VIEW IF EXISTS task_schedule"))
+        conn.execute(text("CREATE VIEW task_schedule AS " + task_schedule_sql()))
+
+
+def pk_key(cls: type) -> str:
+    mapper = cls.__mapper__  # type: ignore
+    return mapper.get_property_by_column(mapper.primary_key[0]).key
+
+
+class MemoryBackend:
+    """
+    Keeps everything in dicts and never touches disk. Primary keys are handed out on
+    `add` the same way sqlite's autoincrement would.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.tables: DefaultDict[type, Dict[Any, Any]] = defaultdict(dict)
+        self.next_pk: DefaultDict[type, int] = defaultdict(lambda: 1)
+
+    def add(self, obj: Any) -> None:
+        cls, key = type(obj), pk_key(type(obj))
+        if (pk := getattr(obj, key)) is None:
+            pk = self.next_pk[cls]
+            setattr(obj, key, pk)
+        self.next_pk[cls] = max(self.next_pk[cls], pk + 1)
+        self.tables[cls][pk] = obj
+
+    def delete(self, obj: Any) -> None:
+        self.tables[type(obj)].pop(getattr(obj, pk_key(type(obj))), None)
+
+    def replace(self, old: Any, new: Any) -> None:
+        if old is new:
+            return
+        self.delete(old)
+        if type(old) is type(new):
+            setattr(new, pk_key(type(new)), getattr(old, pk_key(type(old))))
+        self.add(new)
+
+    def commit(self) -> None:
+        ...
+
+    def load(self, cls: type) -> List[Any]:
+        return list(self.tables[cls].values())
+
+    def range(self, cls: type, key: str, start: float, end: float) -> List[Any]:
+        return [
+            obj
+            for obj in self.tables[cls].values()
+            if (val := getattr(obj, key)) is not None and start <= val < end
+        ]
+
+
+class SQLAlchemyBackend:
+    """Any database SQLAlchemy has a url for, e.g. postgresql://user:pw@host/db."""
+
+    def __init__(self, url: str) -> None:
+        self.lock = threading.RLock()
+        self.engine = create_engine(url)
+        Base.metadata.create_all(self.engine, checkfirst=True)  # type: ignore
+        self.migrator = Migrator(self.engine)
+        self.migrator.upgrade()
+        # the in-memory objects are the source of truth, so don't reload them after
+        # commits
+        self.session: Any = sessionmaker(bind=self.engine, expire_on_commit=False)()
+
+    def add(self, obj: Any) -> None:
+        self.session.add(obj)
+
+    def delete(self, obj: Any) -> None:
+        self.session.delete(obj)
+
+    def replace(self, old: Any, new: Any) -> None:
+        """
+        Moves `new` onto `old`'s row and updates only the columns that differ, rather
+        than deleting one row and inserting another. `old` is detached afterwards.
+        """
+        if old is new:
+            return
+        if type(old) is not type(new) or not inspect(old).persistent:
+            self.delete(old)
+            self.add(new)
+            return
+        mapper = class_mapper(type(old))
+        pk = pk_key(type(old))
+        changed = {
+            prop.key: value
+            for prop in mapper.column_attrs
+            if prop.key != pk
+            and (value := getattr(new, prop.key)) != getattr(old, prop.key)
+        }
+        self.session.expunge(old)
+        for prop in mapper.column_attrs:
+            set_committed_value(new, prop.key, getattr(old, prop.key))
+        make_transient_to_detached(new)
+        self.session.add(new)
+        for key, value in changed.items():
+            setattr(new, key, value)
+
+    def commit(self) -> None:
+        self.session.commit()
+
+    def load(self, cls: type) -> List[Any]:
+        return self.session.query(cls).all()
+
+    def range(self, cls: type, key: str, start: float, end: float) -> List[Any]:
+        column = getattr(cls, key)
+        return self.session.query(cls).filter(column >= start, column < end).all()
+
+
+class SQLiteBackend(SQLAlchemyBackend):
+    """A single sqlite file, plus the `task_schedule` view for ad-hoc queries."""
+
+    def __init__(self, path: str = "data.db") -> None:
+        super().__init__(f"sqlite:///{path}")
+        create_task_schedule_view(self.engine)
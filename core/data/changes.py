@@ -0,0 +1,110 @@
+"""
+In-process change data capture for DataHandler. AtomicDBList/AtomicDBDict publish a
+Change after every committed mutation, so derived structures can follow along
+instead of rescanning the collections.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Iterable, List, Literal, NamedTuple, Optional, Set
+
+from core.utils.exceptions import ChangeStreamLagged
+
+
+class Change(NamedTuple):
+    op: Literal["insert", "update", "delete"]
+    collection: str  # attribute name on DataHandler, e.g. "tasks"
+    key: Any  # dict key, None for lists
+    old: Any  # None for inserts
+    new: Any  # None for deletes
+
+
+class Subscription:
+    """
+    A bounded queue of changes. A subscriber that falls `max_size` changes behind is
+    dropped to a lagged state instead of slowing writers down: its queue is cleared,
+    and its next `get` raises ChangeStreamLagged so it can rebuild from a snapshot.
+    Changes are accepted again from then on.
+    """
+
+    def __init__(
+        self,
+        stream: "ChangeStream",
+        max_size: int,
+        collections: Optional[Set[str]],
+    ) -> None:
+        self.stream = stream
+        self.max_size = max_size
+        self.collections = collections
+        self.queue: Deque[Change] = deque()
+        self.lagged = False
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.ready: Optional[asyncio.Event] = None
+
+    def put(self, change: Change) -> None:
+        if self.collections is not None and change.collection not in self.collections:
+            return
+        with self.lock:
+            if self.lagged:
+                return
+            if len(self.queue) >= self.max_size:
+                self.queue.clear()
+                self.lagged = True
+            else:
+                self.queue.append(change)
+        if self.loop is not None and self.ready is not None:
+            self.loop.call_soon_threadsafe(self.ready.set)
+
+    def get_nowait(self) -> Optional[Change]:
+        with self.lock:
+            if self.lagged:
+                self.lagged = False
+                raise ChangeStreamLagged()
+            return self.queue.popleft() if self.queue else None
+
+    async def get(self) -> Change:
+        if self.ready is None:
+            self.loop, self.ready = asyncio.get_running_loop(), asyncio.Event()
+        while (change := self.get_nowait()) is None:
+            self.ready.clear()
+            if self.queue or self.lagged:
+                continue
+            await self.ready.wait()
+        return change
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Change:
+        return await self.get()
+
+    def close(self) -> None:
+        self.stream.unsubscribe(self)
+
+
+class ChangeStream:
+    def __init__(self) -> None:
+        self.subscriptions: List[Subscription] = []
+
+    def subscribe(
+        self, max_size: int = 1000, collections: Optional[Iterable[str]] = None
+    ) -> Subscription:
+        """Changes to `collections` (default all) from now on."""
+        sub = Subscription(
+            self, max_size, None if collections is None else set(collections)
+        )
+        self.subscriptions = [*self.subscriptions, sub]
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self.subscriptions = [x for x in self.subscriptions if x is not sub]
+
+    def publish(self, change: Change) -> None:
+        # the list is replaced rather than mutated, so iterating it needs no lock
+        for sub in self.subscriptions:
+            sub.put(change)
@@ -2,17 +2,23 @@
 Imports all classes which we expect to write to db, and sets up db connection.
 """
 
-from typing import Any
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
+from core.data.backend import SQLAlchemyBackend, SQLiteBackend
 from core.data.base import Base
+from core.data.sharding import ShardedBackend
+from core.utils.constants import db_url, shard_dir, shards
 from core.utils.walk import subclasses_of
 
 # this call imports any subclass of Base internally, which is what we want
 subclasses_of(Base)
 
-engine = create_engine("sqlite:///data.db")
-Base.metadata.create_all(engine, checkfirst=True)  # type: ignore
-Session: Any = sessionmaker(bind=engine)
-session = Session()
+backend: SQLAlchemyBackend | ShardedBackend = (
+    ShardedBackend(shard_dir, shards)
+    if shards is not None
+    else SQLiteBackend("data.db")
+    if db_url is None
+    else SQLAlchemyBackend(db_url)
+)
+# with sharding these are the routing directory's, so tables that aren't split by
+# user, like the activation history, live in directory.db next to the shards
+engine = backend.engine
+session = backend.session
@@ -1,5 +1,7 @@
+from datetime import datetime as dt
 from functools import cache
-import threading
+from math import inf
+from types import MappingProxyType
 from typing import (
     Any,
     Awaitable,
@@ -7,34 +9,98 @@ from typing import (
     Dict,
     Iterable,
     List,
+    Mapping,
     Optional,
-    Set,
     SupportsIndex,
     Tuple,
     TypeVar,
     cast,
     overload,
 )
-from core.data.db import session
-from core.data.writable import Alert, Task, Timezone, UserTask, Wakeup
+from sqlalchemy.orm.attributes import set_committed_value
+from core.data.backend import SQLAlchemyBackend
+from core.data.changes import Change, ChangeStream
+from core.data.db import backend, engine
+from core.data.history import ActivationHistory
+from core.data.sharding import ShardedBackend
+from core.data.snapshot import FastRestart
+from core.data.reminder_msgs import ReminderMessages
+from core.data.writable import (
+    Alert,
+    ReminderMessage,
+    Task,
+    Timezone,
+    UserTask,
+    Wakeup,
+)
+from core.timer import now
 from core.utils.exceptions import MissingTimezoneException
 from core.utils.walk import subclasses_of
-from custom_typing.protocols import Writable
-from core.utils.constants import banned_users
+from custom_typing.protocols import StorageBackend, Writable
+from core.utils.constants import (
+    banned_users,
+    persist_reminder_msgs,
+    record_history,
+    snapshot_dir,
+)
 
 T = TypeVar("T", bound=Writable | Task)
 
 
+@cache
+def task_tables() -> List[type]:
+    return [
+        subcls for subcls in subclasses_of(Task) if hasattr(subcls, "__tablename__")
+    ]
+
+
+def forbid(*names: str) -> Callable[[type], type]:
+    """
+    Replaces inherited methods that would change a collection behind its backend's
+    back with ones that raise. Done once per class, so attribute access costs nothing.
+    """
+
+    def decorate(cls: type) -> type:
+        def unsupported(name: str) -> Callable[..., Any]:
+            def method(*_: Any, **__: Any) -> Any:
+                raise NotImplementedError(
+                    f"Method '{name}' not supported in {cls.__name__}"
+                )
+
+            return method
+
+        for name in names:
+            if name in vars(cls):
+                raise TypeError(f"{cls.__name__} implements '{name}' itself")
+            setattr(cls, name, unsupported(name))
+        return cls
+
+    return decorate
+
+
+def publish(collection: Any, op: Any, key: Any, old: Any, new: Any) -> None:
+    """Tells `collection`'s change subscribers, if any, about a committed mutation."""
+    if collection.changes is not None and collection.changes.subscriptions:
+        collection.changes.publish(Change(op, collection.name, key, old, new))
+
+
 class DBLock:
-    def __init__(self) -> None:
-        self.lock = threading.Lock()
+    """
+    Holds the backend's lock, then commits on release. It's the same reentrant lock
+    every collection on that backend takes for each mutation, so bulk jobs can call
+    collection methods while holding it, and there's no lock order to get wrong.
+    """
+
+    def __init__(self, backend: StorageBackend = backend) -> None:
+        self.lock = backend.lock
+        self.backend = backend
 
     def acquire(self):
         self.lock.acquire()
 
     def release(self):
         self.lock.release()
-        session.commit()
+        self.backend.commit()
 
     def __enter__(self):
         self.acquire()
@@ -44,72 +110,117 @@ class DBLock:
         self.release()
 
 
+@forbid("__delitem__", "__iadd__", "__imul__", "sort", "reverse")
 class AtomicDBList(list[T]):
-    @staticmethod
-    @cache
-    def unsupported_methods() -> Set[str]:
-        return set(name for name in dir(list) if not hasattr(AtomicDBList, name))
-
-    def __getattribute__(self, name: str) -> Any:
-        if name in AtomicDBList.unsupported_methods():
-            raise NotImplementedError(f"Method '{name}' not supported in AtomicDBList")
-        return super().__getattribute__(name)
-
-    def __init__(self, items: Optional[List[T]] = None) -> None:
+    """
+    Mutations take the backend's lock, as its session isn't thread safe, and change
+    the list, the backend and `version` together under it.
+    """
+
+    def __init__(
+        self,
+        items: Optional[List[T]] = None,
+        backend: StorageBackend = backend,
+        changes: Optional[ChangeStream] = None,
+        name: str = "",
+    ) -> None:
         super().__init__()
-        self.lock = threading.Lock()
+        self.changes = changes
+        self.name = name
+        self.backend = backend
+        self.lock = backend.lock
+        # bumped with each mutation, so readers can cache derived data
+        self.version = 0
+        self.snapshot_version = -1
+        self._snapshot: Tuple[T, ...] = ()
         super().extend(items or [])
 
     def append(self, item: T) -> None:
         with self.lock:
             super().append(item)
-            session.add(item)
-            session.commit()
+            self.version += 1
+            self.backend.add(item)
+            self.backend.commit()
+            publish(self, "insert", None, None, item)
 
     def extend(self, iterable: Iterable[T]) -> None:
+        items = list(iterable)
         with self.lock:
-            for item in iterable:
-                self.session.add(item)
+            for item in items:
+                self.backend.add(item)
                 super().append(item)
-            session.commit()
+            self.version += 1
+            self.backend.commit()
+            for item in items:
+                publish(self, "insert", None, None, item)
 
     def insert(self, index: SupportsIndex, item: T) -> None:
         with self.lock:
             super().insert(index, item)
-            session.add(item)
-            session.commit()
+            self.version += 1
+            self.backend.add(item)
+            self.backend.commit()
+            publish(self, "insert", None, None, item)
 
     def remove(self, item: T) -> None:
         with self.lock:
             super().remove(item)
-            session.delete(item)
-            session.commit()
+            self.version += 1
+            self.backend.delete(item)
+            self.backend.commit()
+            publish(self, "delete", None, item, None)
 
     def pop(self, index: SupportsIndex = -1) -> T:
         with self.lock:
             item = super().pop(index)
-            session.delete(item)
-            session.commit()
+            self.version += 1
+            self.backend.delete(item)
+            self.backend.commit()
+            publish(self, "delete", None, item, None)
             return item
 
     def clear(self) -> None:
         with self.lock:
-            for item in self:
-                session.delete(item)
+            items = list(self)
+            for item in items:
+                self.backend.delete(item)
             super().clear()
-            session.commit()
+            self.version += 1
+            self.backend.commit()
+            for item in items:
+                publish(self, "delete", None, item, None)
 
-    async def async_filter(self, filter: Callable[[T], Awaitable[bool]]) -> None:
+    def discard(self, item: T) -> bool:
+        """Removes `item` if it's still here, e.g. a command didn't beat us to it."""
+        with self.lock:
+            if not any(x is item for x in self):
+                return False
+            super().remove(item)
+            self.version += 1
+            self.backend.delete(item)
+            self.backend.commit()
+            publish(self, "delete", None, item, None)
+            return True
+
+    def snapshot(self) -> Tuple[T, ...]:
+        """
+        An immutable copy of the current version, safe to iterate across awaits while
+        commands keep mutating. Copied at most once per version.
+        """
         with self.lock:
-            empty_idx = 0
-            for i in range(len(self)):
-                if await filter(self[i]):
-                    super().__setitem__(empty_idx, super().__getitem__(i))
-                    empty_idx += 1
-            for i in range(len(self) - empty_idx):
-                session.delete(super().__getitem__(-1))
-                super().pop()
-            session.commit()
+            if self.snapshot_version != self.version:
+                self._snapshot = tuple(self)
+                self.snapshot_version = self.version
+            return self._snapshot
+
+    async def async_filter(self, filter: Callable[[T], Awaitable[bool]]) -> None:
+        """
+        Awaits `filter` over a snapshot without holding the lock, so commands aren't
+        blocked by slow sends, then drops rejected items that are still around.
+        """
+        rejected = [item for item in self.snapshot() if not await filter(item)]
+        for item in rejected:
+            self.discard(item)
 
     @overload
     def __setitem__(self, index: SupportsIndex, item: T) -> None:
@@ -124,69 +235,107 @@ class AtomicDBList(list[T]):
             if isinstance(index, slice) or isinstance(item, Iterable):
                 raise TypeError("why")
             else:
-                self.session.delete(self[index])
-                self[index] = item
-                session.add(item)
-                session.commit()
+                old = super().__getitem__(index)
+                self.backend.replace(old, item)
+                super().__setitem__(index, item)
+                self.version += 1
+                self.backend.commit()
+                publish(self, "update", None, old, item)
 
 
 K = TypeVar("K")
 V = TypeVar("V", bound=Writable)
 
 
+@forbid("pop", "popitem", "setdefault", "update", "__ior__")
 class AtomicDBDict(dict[K, V]):
-    @staticmethod
-    @cache
-    def unsupported_methods() -> Set[str]:
-        return set(name for name in dir(dir) if not hasattr(AtomicDBDict, name))
-
-    def __getattribute__(self, name: str) -> Any:
-        if name in AtomicDBDict.unsupported_methods():
-            raise NotImplementedError(f"Method '{name}' not supported in AtomicDBDict")
-        return super().__getattribute__(name)
-
-    def __init__(self, items: Optional[Dict[K, V]] = None, tz: bool = False) -> None:
+    """
+    Mutations take the backend's lock, as its session isn't thread safe, and change
+    the dict, the backend and `version` together under it. Lookups don't lock.
+    """
+
+    def __init__(
+        self,
+        items: Optional[Dict[K, V]] = None,
+        tz: bool = False,
+        backend: StorageBackend = backend,
+        changes: Optional[ChangeStream] = None,
+        name: str = "",
+    ) -> None:
         super().__init__()
-        self.lock = threading.Lock()
+        self.changes = changes
+        self.name = name
+        self.backend = backend
+        self.lock = backend.lock
+        # bumped with each mutation, so readers can cache derived data
+        self.version = 0
+        self.snapshot_version = -1
+        self._snapshot: Mapping[K, V] = MappingProxyType({})
         self.tz = tz
         super().update(items or {})
 
     def __getitem__(self, key: K) -> V:
-        with self.lock:
-            if self.tz and not super().__contains__(key):
-                raise MissingTimezoneException()
+        try:
             return super().__getitem__(key)
+        except KeyError:
+            if self.tz:
+                raise MissingTimezoneException()
+            raise
 
     def __setitem__(self, key: K, value: V) -> None:
         with self.lock:
-            if super().__contains__(key):
-                session.delete(super().__getitem__(key))
-            session.add(value)
+            old = super().get(key)
+            if old is not None:
+                self.backend.replace(old, value)
+            else:
+                self.backend.add(value)
             super().__setitem__(key, value)
-            session.commit()
+            self.version += 1
+            self.backend.commit()
+            publish(self, "insert" if old is None else "update", key, old, value)
 
     def __delitem__(self, key: K):
         with self.lock:
             if key not in self:
                 return
-            session.delete(super().__getitem__(key))
+            old = super().__getitem__(key)
+            self.backend.delete(old)
             super().__delitem__(key)
-            session.commit()
+            self.version += 1
+            self.backend.commit()
+            publish(self, "delete", key, old, None)
 
     def clear(self) -> None:
         with self.lock:
-            for _, value in super().items():
-                session.delete(value)
+            items = list(super().items())
+            for _, value in items:
+                self.backend.delete(value)
             super().clear()
-            session.commit()
+            self.version += 1
+            self.backend.commit()
+            for key, value in items:
+                publish(self, "delete", key, value, None)
 
     def keys(self):
         return super().keys()
 
+    def snapshot(self) -> Mapping[K, V]:
+        """
+        A read-only copy of the current version, safe to iterate across awaits while
+        commands keep mutating. Copied at most once per version.
+        """
+        with self.lock:
+            if self.snapshot_version != self.version:
+                self._snapshot = MappingProxyType(dict(super().items()))
+                self.snapshot_version = self.version
+            return self._snapshot
+
     async def async_lambda(self, call: Callable[[K, V], Awaitable[None]]) -> None:
+        """Awaits `call` over a snapshot, without blocking commands meanwhile."""
+        for k, v in self.snapshot().items():
+            await call(k, v)
         with self.lock:
-            for k, v in self.items():
-                await call(k, v)
+            self.backend.commit()
 
 
 class DataHandler:
@@ -198,36 +347,70 @@ class DataHandler:
         return cls._instance
 
     def __init__(self) -> None:
-        self.reminder_msgs: Dict[Tuple[int, str], Alert] = {}
+        self.backend: StorageBackend = backend
+        self.reminder_msgs = ReminderMessages(
+            backend=self.backend if persist_reminder_msgs else None
+        )
+        self.changes = ChangeStream()
+        self.history: Optional[ActivationHistory] = (
+            ActivationHistory(engine) if record_history else None
+        )
+        self.fast_restart: Optional[FastRestart] = (
+            FastRestart(snapshot_dir, self.backend)
+            if snapshot_dir is not None and isinstance(self.backend, SQLAlchemyBackend)
+            else None
+        )
         self.populate_data()
 
     def populate_data(self) -> None:
         if hasattr(self, "tasks") and self.tasks is not None:  # type: ignore
             return
-        self.tasks: AtomicDBList[Task] = AtomicDBList(
+        # some rows' next activation is only known in memory, see due_tasks
+        self.backfilling = False
+        snapshot = None if self.fast_restart is None else self.fast_restart.load()
+        objs: List[Any] = (
             [
                 x
-                for subcls in subclasses_of(Task)
-                if hasattr(subcls, "__tablename__") and subcls != Wakeup
-                for x in (session.query(subcls)).all()  # type: ignore
+                for subcls in (*task_tables(), Timezone, UserTask, ReminderMessage)
+                for x in self.backend.load(subcls)
             ]
+            if snapshot is None
+            else [x for table_objs in snapshot.values() for x in table_objs]
+        )
+        self.tasks: AtomicDBList[Task] = AtomicDBList(
+            [x for x in objs if isinstance(x, Task) and not isinstance(x, Wakeup)],
+            backend=self.backend,
+            changes=self.changes,
+            name="tasks",
         )
         self.timezones: AtomicDBDict[int, Timezone] = AtomicDBDict(
             {
                 cast(int, tz._id): tz  # type: ignore
-                for tz in session.query(Timezone).all()  # type: ignore
+                for tz in objs
+                if isinstance(tz, Timezone)
             },
             tz=True,
+            backend=self.backend,
+            changes=self.changes,
+            name="timezones",
         )
         self.user_tasks: AtomicDBList[UserTask] = AtomicDBList(
-            session.query(UserTask).all()  # type: ignore
+            [x for x in objs if isinstance(x, UserTask)],
+            backend=self.backend,
+            changes=self.changes,
+            name="user_tasks",
         )
         self.wakeup: AtomicDBDict[int, Wakeup] = AtomicDBDict(
             {
                 cast(int, wakeup.user): wakeup  # type: ignore
-                for wakeup in session.query(Wakeup).all()  # type: ignore
-            }
+                for wakeup in objs
+                if isinstance(wakeup, Wakeup)
+            },
+            backend=self.backend,
+            changes=self.changes,
+            name="wakeup",
         )
+        self.reminder_msgs.load(x for x in objs if isinstance(x, ReminderMessage))
         task_remove: List[Alert] = []
         for task in self.tasks:
             if isinstance(task, Alert) and task.user in banned_users:
@@ -246,6 +429,87 @@ class DataHandler:
         for _id, _ in list(self.timezones.items()):
             if _id in banned_users:
                 del self.timezones[_id]
+        self.backfill_next_activation()
+
+    def persisted(self) -> List[Any]:
+        """Every object in memory that is also stored in the backend."""
+        return [
+            *self.tasks,
+            *self.wakeup.values(),
+            *self.timezones.values(),
+            *self.user_tasks,
+            *self.reminder_msgs.persisted(),
+        ]
+
+    def commit(self) -> None:
+        """Commits what was changed on loaded objects, e.g. by the Timer."""
+        with self.backend.lock:
+            self.backend.commit()
+
+    def maybe_snapshot(self) -> None:
+        if self.fast_restart is not None:
+            self.fast_restart.maybe_snapshot(self)
+
+    def maintain_history(self) -> None:
+        if self.history is not None:
+            self.history.maintain(now())
+
+    def move_user(self, user: int, shard: int) -> int:
+        """Rebalances `user` onto another shard while the bot keeps running."""
+        if not isinstance(self.backend, ShardedBackend):
+            raise TypeError("Not sharded, see `shards` in constants.")
+        with DBLock(self.backend):
+            return self.backend.move_user(user, shard)
+
+    def backfill_next_activation(self) -> None:
+        """
+        Rows written before `_next_activation` existed need it to be scheduled. It's
+        only set in memory here; migration 2 writes it to the db in the background.
+        """
+        curr_time = now()
+        for task in (*self.tasks, *self.wakeup.values()):
+            if task._next_activation is None:
+                self.backfilling = True
+                set_committed_value(
+                    task,
+                    "_next_activation",
+                    task.get_next_activation(curr_time).timestamp(),
+                )
+
+    async def migrate(self) -> None:
+        """Runs pending backfills while the bot serves, see core.data.migrations."""
+        migrators = [
+            migrator
+            for shard in getattr(self.backend, "shards", [self.backend])
+            if (migrator := getattr(shard, "migrator", None)) is not None
+        ]
+        for migrator in migrators:
+            await migrator.backfill()
+        self.backfilling = self.backfilling and any(m.pending() for m in migrators)
+
+    def due_tasks(self, start: Optional[dt], end: dt) -> List[Task]:
+        """
+        Range queries the backend for tasks with their next activation in [start, end),
+        or before `end` if `start` is None. Returned objects are the same instances as
+        those held in memory. Until migration 2 has stored the activations filled in
+        at load, the db can't answer, so the tasks in memory are filtered instead.
+        """
+        lo, hi = -inf if start is None else start.timestamp(), end.timestamp()
+        if self.backfilling:
+            due: Iterable[Task] = (
+                task
+                for task in (*self.tasks.snapshot(), *self.wakeup.snapshot().values())
+                if task._next_activation is not None
+                and lo <= task._next_activation < hi
+            )
+        else:
+            with self.backend.lock:
+                due = [
+                    x
+                    for subcls in task_tables()
+                    for x in self.backend.range(subcls, "_next_activation", lo, hi)
+                ]
+        return sorted(due, key=lambda task: cast(float, task._next_activation))
 
     def __setattr__(self, __name: str, __value: Any) -> None:
         if hasattr(self, __name) and isinstance(
@@ -0,0 +1,191 @@
+"""
+Append-only history of fired tasks, rolled up into per-minute and per-hour counts.
+Kept on its own MetaData and written through Core rather than the session, so it
+stays out of DataHandler's collections, the snapshot and the journal.
+"""
+
+from datetime import datetime as dt, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import (
+    Column,
+    ColumnElement,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    and_,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+)
+
+from core.data.backend import pk_key
+
+metadata = MetaData()
+
+activation_history = Table(
+    "activation_history",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("fired", Float, index=True),
+    Column("kind", String),
+    Column("task_id", Integer),
+    Column("user", Integer),
+    Column("late", Float),  # seconds after its scheduled activation
+)
+
+activation_rollup = Table(
+    "activation_rollup",
+    metadata,
+    Column("resolution", Integer, primary_key=True),  # seconds per bucket
+    Column("bucket", Float, primary_key=True),  # start of the bucket
+    Column("kind", String, primary_key=True),
+    Column("count", Integer),
+    Column("max_late", Float),
+)
+
+MINUTE, HOUR = 60, 3600
+
+
+class ActivationHistory:
+    """
+    `record` only buffers, and writes the buffer in one batch once it holds
+    `batch_size` rows. `maintain`, called from the Timer loop, writes it every
+    `flush_interval` and before rolling up, folds finished minutes and hours into
+    rollups and drops whatever is past its retention. Raw rows are the only thing
+    that grows with traffic, and they're compacted into at most one rollup row per
+    kind and minute.
+    """
+
+    def __init__(
+        self,
+        engine: Any,
+        batch_size: int = 500,
+        flush_interval: timedelta = timedelta(seconds=10),
+        raw_retention: timedelta = timedelta(days=7),
+        minute_retention: timedelta = timedelta(days=30),
+        hour_retention: timedelta = timedelta(days=365),
+    ) -> None:
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval.total_seconds()
+        self.flushed = float("-inf")
+        self.raw_retention = raw_retention.total_seconds()
+        self.rollup_retention = {
+            MINUTE: minute_retention.total_seconds(),
+            HOUR: hour_retention.total_seconds(),
+        }
+        self.pending: List[Dict[str, Any]] = []
+        metadata.create_all(engine, checkfirst=True)
+        self.rolled_up = {res: self._rolled_up(res) for res in (MINUTE, HOUR)}
+
+    def record(self, task: Any, scheduled: Optional[float], fired: dt) -> None:
+        self.pending.append(
+            {
+                "fired": fired.timestamp(),
+                "kind": type(task).__tablename__,
+                "task_id": getattr(task, pk_key(type(task))),
+                "user": getattr(task, "user", None),
+                "late": None if scheduled is None else fired.timestamp() - scheduled,
+            }
+        )
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(insert(activation_history), self.pending)
+        self.pending = []
+
+    def maintain(self, curr_time: dt) -> None:
+        ts = curr_time.timestamp()
+        roll_up = ts - self.rolled_up[MINUTE] >= 2 * MINUTE
+        # pending rows would be left out of the minutes rolled up
+        if roll_up or ts - self.flushed >= self.flush_interval:
+            self.flush()
+            self.flushed = ts
+        if roll_up:
+            self.roll_up(MINUTE, ts)
+        if ts - self.rolled_up[HOUR] >= 2 * HOUR:
+            self.roll_up(HOUR, ts)
+            self.expire(ts)
+
+    def _rolled_up(self, resolution: int) -> float:
+        """Start of the last bucket rolled up at `resolution`, -inf if none yet."""
+        with self.engine.connect() as conn:
+            last = conn.execute(
+                select(func.max(activation_rollup.c.bucket)).where(
+                    activation_rollup.c.resolution == resolution
+                )
+            ).scalar()
+        return float("-inf") if last is None else last
+
+    def roll_up(self, resolution: int, ts: float) -> None:
+        """Aggregates every finished bucket after the last rolled up one."""
+        start = self.rolled_up[resolution] + resolution
+        end = ts // resolution * resolution
+        count: ColumnElement[Any]
+        if resolution == MINUTE:
+            src = activation_history
+            when, count, late = src.c.fired, func.count(), func.max(src.c.late)
+            conds = [when < end]
+        else:
+            src = activation_rollup
+            when = src.c.bucket
+            count, late = func.sum(src.c.count), func.max(src.c.max_late)
+            conds = [src.c.resolution == MINUTE, when < end]
+        if start > float("-inf"):
+            conds.append(when >= start)
+        bucket = cast(when / resolution, Integer) * resolution
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(activation_rollup).from_select(
+                    ["resolution", "bucket", "kind", "count", "max_late"],
+                    select(literal(resolution), bucket, src.c.kind, count, late)
+                    .where(and_(*conds))
+                    .group_by(bucket, src.c.kind),
+                )
+            )
+        self.rolled_up[resolution] = end - resolution
+
+    def expire(self, ts: float) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(
+                delete(activation_history).where(
+                    activation_history.c.fired < ts - self.raw_retention
+                )
+            )
+            for resolution in (MINUTE, HOUR):
+                conn.execute(
+                    delete(activation_rollup).where(
+                        activation_rollup.c.resolution == resolution,
+                        activation_rollup.c.bucket
+                        < ts - self.rollup_retention[resolution],
+                    )
+                )
+
+    def counts(
+        self, start: dt, end: dt, resolution: int = HOUR, kind: Optional[str] = None
+    ) -> Dict[dt, int]:
+        """Activations per bucket in [start, end), from the rollups alone."""
+        query = (
+            select(activation_rollup.c.bucket, func.sum(activation_rollup.c.count))
+            .where(
+                activation_rollup.c.resolution == resolution,
+                activation_rollup.c.bucket >= start.timestamp(),
+                activation_rollup.c.bucket < end.timestamp(),
+            )
+            .group_by(activation_rollup.c.bucket)
+            .order_by(activation_rollup.c.bucket)
+        )
+        if kind is not None:
+            query = query.where(activation_rollup.c.kind == kind)
+        with self.engine.connect() as conn:
+            return {dt.fromtimestamp(bucket): n for bucket, n in conn.execute(query)}
@@ -0,0 +1,204 @@
+"""
+Versioned schema migrations that don't need downtime. Each step's DDL runs when the
+backend starts and has to be quick (adding a column, an index). Anything slow, like
+filling in a new column, is a backfill that runs in batches in the background while
+the bot keeps serving; the step only counts as applied once the backfill is done.
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    bindparam,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.orm.attributes import set_committed_value
+
+from core.data.base import Base
+from core.data.writable import Task
+from core.timer import now
+
+metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String),
+    Column("applied", Float),
+)
+
+
+class Migration:
+    def __init__(
+        self,
+        version: int,
+        name: str,
+        ddl: Optional[Callable[[Any], None]] = None,
+        backfill: Optional[Callable[[Any, int], int]] = None,
+        remaining: Optional[Callable[[Any], int]] = None,
+    ) -> None:
+        """
+        `backfill(conn, n)` handles up to `n` rows and returns how many it did;
+        `remaining(conn)` says how many are left, for progress and the cutover.
+        """
+        self.version = version
+        self.name = name
+        self.ddl = ddl
+        self.backfill = backfill
+        self.remaining = remaining
+
+
+def add_missing_columns(conn: Any) -> None:
+    """
+    `create_all` only creates missing tables, so columns added to existing tables
+    (e.g. `_next_activation`) have to be added by hand. New columns start as NULL.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:  # type: ignore
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(
+                    text(
+                        f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" '
+                        f"{column.type.compile(conn.dialect)}"
+                    )
+                )
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def task_mappers() -> List[Any]:
+    return [
+        mapper
+        for mapper in Base.registry.mappers  # type: ignore
+        if issubclass(mapper.class_, Task) and hasattr(mapper.class_, "__tablename__")
+    ]
+
+
+def missing_next_activation(conn: Any) -> int:
+    return sum(
+        conn.execute(
+            select(func.count())
+            .select_from(mapper.local_table)
+            .where(mapper.local_table.c._next_activation.is_(None))
+        ).scalar()
+        for mapper in task_mappers()
+    )
+
+
+def backfill_next_activation(conn: Any, batch_size: int) -> int:
+    """Computes `_next_activation` from each row's columns, as the model would."""
+    curr_time, done = now(), 0
+    for mapper in task_mappers():
+        table = mapper.local_table
+        rows = conn.execute(
+            select(table)
+            .where(table.c._next_activation.is_(None))
+            .limit(batch_size - done)
+        ).mappings()
+        updates: List[Dict[str, Any]] = []
+        for row in rows:
+            task = mapper.class_manager.new_instance()
+            for prop in mapper.column_attrs:
+                set_committed_value(task, prop.key, row[prop.columns[0].name])
+            task.init_on_load()
+            updates.append(
+                {
+                    "pk": row[mapper.primary_key[0].name],
+                    "value": task.get_next_activation(curr_time).timestamp(),
+                }
+            )
+        if updates:
+            conn.execute(
+                update(table)
+                .where(mapper.primary_key[0] == bindparam("pk"))
+                .values(_next_activation=bindparam("value")),
+                updates,
+            )
+        if (done := done + len(updates)) >= batch_size:
+            break
+    return done
+
+
+migrations = [
+    Migration(1, "add columns declared on the models", ddl=add_missing_columns),
+    Migration(
+        2,
+        "backfill _next_activation",
+        backfill=backfill_next_activation,
+        remaining=missing_next_activation,
+    ),
+]
+
+
+class Migrator:
+    def __init__(self, engine: Any, steps: List[Migration] = migrations) -> None:
+        self.engine = engine
+        self.steps = steps
+        self.progress: Dict[int, Tuple[int, int]] = {}  # version -> (done, total)
+        metadata.create_all(engine, checkfirst=True)
+
+    def applied(self) -> List[int]:
+        with self.engine.connect() as conn:
+            return sorted(conn.execute(select(schema_version.c.version)).scalars())
+
+    def pending(self) -> List[Migration]:
+        applied = set(self.applied())
+        return [step for step in self.steps if step.version not in applied]
+
+    def record(self, conn: Any, step: Migration) -> None:
+        conn.execute(
+            schema_version.insert(),
+            {"version": step.version, "name": step.name, "applied": now().timestamp()},
+        )
+
+    def upgrade(self) -> None:
+        """Runs every pending step's DDL, and applies the ones with no backfill."""
+        for step in self.pending():
+            with self.engine.begin() as conn:
+                if step.ddl is not None:
+                    step.ddl(conn)
+                if step.backfill is None:
+                    self.record(conn, step)
+
+    async def backfill(
+        self,
+        batch_size: int = 500,
+        pause: float = 0.05,
+        report: Callable[[str], None] = print,
+    ) -> None:
+        """
+        Works through pending backfills a batch per transaction, yielding to the
+        event loop in between. The step is recorded as applied in the same
+        transaction that finds nothing left to do.
+        """
+        for step in self.pending():
+            if step.backfill is None or step.remaining is None:
+                continue
+            with self.engine.connect() as conn:
+                total = step.remaining(conn)
+            done = 0
+            while True:
+                with self.engine.begin() as conn:
+                    if step.remaining(conn) == 0:
+                        self.record(conn, step)
+                        break
+                    if not (batch := step.backfill(conn, batch_size)):
+                        report(f"Migration {step.version} ({step.name}) is stuck")
+                        return
+                    done += batch
+                self.progress[step.version] = (done, total)
+                report(f"Migration {step.version} ({step.name}): {done}/{total}")
+                await asyncio.sleep(pause)
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from datetime import datetime as dt, timedelta
+from typing import Iterable, List, Optional
+
+from core.data.writable import ReminderMessage
+from core.timer import now
+from custom_typing.protocols import StorageBackend
+
+
+class ReminderMessages:
+    """
+    Delivered alerts by discord message id, so reactions route with a dict lookup.
+    Entries expire after `ttl`, and the least recently used ones are evicted past
+    `max_size`. With a backend, entries are persisted and survive restarts.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: timedelta = timedelta(days=7),
+        backend: Optional[StorageBackend] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl.total_seconds()
+        self.backend = backend
+        self.entries: OrderedDict[int, ReminderMessage] = OrderedDict()
+
+    def load(self, msgs: Iterable[ReminderMessage]) -> None:
+        """Picks persisted entries back up after a restart, dropping stale ones."""
+        for msg in sorted(msgs, key=lambda x: x._sent):
+            self.entries[msg._id] = msg
+        self._evict(now())
+
+    def add(self, message_id: int, user: int, msg: str) -> None:
+        """The entry is committed with the caller's next commit, e.g. the Timer's."""
+        curr_time = now()
+        old = self.entries.pop(message_id, None)
+        self.entries[message_id] = entry = ReminderMessage(
+            message_id, user, msg, curr_time
+        )
+        if self.backend is not None:
+            with self.backend.lock:
+                if old is None:
+                    self.backend.add(entry)
+                else:
+                    self.backend.replace(old, entry)
+        self._evict(curr_time)
+
+    def get(self, message_id: int) -> Optional[ReminderMessage]:
+        if (entry := self.entries.get(message_id)) is None:
+            return None
+        if self._expired(entry, now()):
+            self._delete([self.entries.pop(message_id)])
+            return None
+        self.entries.move_to_end(message_id)
+        return entry
+
+    def __contains__(self, message_id: int) -> bool:
+        return self.get(message_id) is not None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def persisted(self) -> List[ReminderMessage]:
+        return [] if self.backend is None else list(self.entries.values())
+
+    def clear(self) -> None:
+        self._delete(list(self.entries.values()))
+        self.entries.clear()
+
+    def _expired(self, entry: ReminderMessage, curr_time: dt) -> bool:
+        return curr_time.timestamp() - entry._sent > self.ttl
+
+    def _evict(self, curr_time: dt) -> None:
+        evicted: List[ReminderMessage] = []
+        while len(self.entries) > self.max_size:
+            evicted.append(self.entries.popitem(last=False)[1])
+        # lru order is close enough to send order that expired ones sit up front
+        while self.entries and self._expired(
+            entry := next(iter(self.entries.values())), curr_time
+        ):
+            evicted.append(self.entries.pop(entry._id))
+        if evicted:
+            self._delete(evicted)
+
+    def _delete(self, entries: List[ReminderMessage]) -> None:
+        """Deletes and commits, under the backend's lock like the collections."""
+        if self.backend is not None:
+            with self.backend.lock:
+                for entry in entries:
+                    self.backend.delete(entry)
+                self.backend.commit()
@@ -0,0 +1,206 @@
+"""
+Optional sharding by user: each user's rows live in one of several sqlite files, so
+one very large community can't dominate table sizes and write locks for everyone.
+A routing directory records users who were moved off their default shard.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Set, TypeVar
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    create_engine,
+    delete,
+    func,
+    select,
+)
+from sqlalchemy.orm import make_transient, object_session, sessionmaker
+
+from core.data.backend import SQLiteBackend, pk_key
+from core.data.base import Base
+from core.data.writable import Timezone
+
+R = TypeVar("R")
+
+metadata = MetaData()
+
+shard_directory = Table(
+    "shard_directory",
+    metadata,
+    Column("user", Integer, primary_key=True),
+    Column("shard", Integer),
+)
+
+
+def owner_of(obj: Any) -> Any:
+    if isinstance(obj, Timezone):
+        return obj._id
+    return getattr(obj, "user", getattr(obj, "user_id", None))
+
+
+def owner_column(cls: type) -> Any:
+    """The column `owner_of` reads, so a user's rows can be selected in SQL."""
+    if issubclass(cls, Timezone):
+        return cls._id  # type: ignore
+    return getattr(cls, "user", getattr(cls, "user_id", None))
+
+
+def tables() -> List[type]:
+    return [
+        mapper.class_
+        for mapper in Base.registry.mappers  # type: ignore
+        if hasattr(mapper.class_, "__tablename__")
+    ]
+
+
+class ShardedBackend:
+    """
+    Routes every object to the shard of the user owning it: the one in the directory,
+    else `user % len(shards)`. Loads and range queries fan out to all shards in
+    parallel. Primary keys are handed out across shards, so rows can move between
+    them without colliding. `engine` and `session` are the directory's, which is
+    also where tables that aren't split by user go, e.g. the activation history.
+    """
+
+    def __init__(self, path: str = "shards", shards: int = 4) -> None:
+        self.lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self.shards = [
+            SQLiteBackend(os.path.join(path, f"shard{i}.db")) for i in range(shards)
+        ]
+        self.engine = create_engine(f"sqlite:///{os.path.join(path, 'directory.db')}")
+        metadata.create_all(self.engine, checkfirst=True)
+        self.session: Any = sessionmaker(bind=self.engine, expire_on_commit=False)()
+        with self.engine.connect() as conn:
+            self.routes: Dict[int, int] = {
+                user: shard for user, shard in conn.execute(select(shard_directory))
+            }
+        self.pool = ThreadPoolExecutor(shards)
+        self.next_pk: Dict[type, int] = {}
+        self.dirty: Set[int] = set()
+
+    def fan_out(self, f: Callable[[SQLiteBackend], R]) -> List[R]:
+        return list(self.pool.map(f, self.shards))
+
+    def shard_of(self, user: Any) -> int:
+        if user is None:
+            return 0
+        return self.routes.get(user, user % len(self.shards))
+
+    def holding(self, obj: Any) -> int:
+        """The shard whose session has `obj`, which may not be its routed one yet."""
+        session = object_session(obj)
+        for i, shard in enumerate(self.shards):
+            if shard.session is session:
+                return i
+        return self.shard_of(owner_of(obj))
+
+    def add(self, obj: Any) -> None:
+        cls, key = type(obj), pk_key(type(obj))
+        if getattr(obj, key) is None:
+            if cls not in self.next_pk:
+                pk_col = cls.__mapper__.primary_key[0]  # type: ignore
+                self.next_pk[cls] = 1 + max(
+                    (
+                        x
+                        for x in self.fan_out(
+                            lambda shard: shard.session.query(func.max(pk_col)).scalar()
+                        )
+                        if x is not None
+                    ),
+                    default=0,
+                )
+            setattr(obj, key, self.next_pk[cls])
+            self.next_pk[cls] += 1
+        i = self.shard_of(owner_of(obj))
+        self.shards[i].add(obj)
+        self.dirty.add(i)
+
+    def delete(self, obj: Any) -> None:
+        i = self.holding(obj)
+        self.shards[i].delete(obj)
+        self.dirty.add(i)
+
+    def replace(self, old: Any, new: Any) -> None:
+        i = self.holding(old)
+        if i == self.shard_of(owner_of(new)):
+            self.shards[i].replace(old, new)
+            self.dirty.add(i)
+            return
+        self.delete(old)
+        if type(old) is type(new):
+            setattr(new, pk_key(type(new)), getattr(old, pk_key(type(old))))
+        self.add(new)
+
+    def commit(self) -> None:
+        dirty, self.dirty = self.dirty, set()
+        list(self.pool.map(lambda i: self.shards[i].commit(), dirty))
+
+    def routed(self, i: int, objs: List[Any]) -> List[Any]:
+        """Drops leftovers of a move that crashed before cleaning up its source."""
+        return [obj for obj in objs if self.shard_of(owner_of(obj)) == i]
+
+    def load(self, cls: type) -> List[Any]:
+        return [
+            obj
+            for i, objs in enumerate(self.fan_out(lambda shard: shard.load(cls)))
+            for obj in self.routed(i, objs)
+        ]
+
+    def range(self, cls: type, key: str, start: float, end: float) -> List[Any]:
+        return [
+            obj
+            for i, objs in enumerate(
+                self.fan_out(lambda shard: shard.range(cls, key, start, end))
+            )
+            for obj in self.routed(i, objs)
+        ]
+
+    def sizes(self) -> List[int]:
+        """Rows per shard, to decide who to move where."""
+        return self.fan_out(
+            lambda shard: sum(shard.session.query(cls).count() for cls in tables())
+        )
+
+    def move_user(self, user: int, target: int) -> int:
+        """
+        Moves every row of `user` to shard `target` and returns how many there were.
+        Rows are copied first and the directory entry is the cutover; the source is
+        only cleaned up after, so a crash at any point loses nothing. Hold `lock`
+        (DBLock) so nothing writes to `user` meanwhile.
+        """
+        source = self.shard_of(user)
+        if source == target:
+            return 0
+        self.commit()
+        src, dst = self.shards[source], self.shards[target]
+        objs = [
+            obj
+            for cls in tables()
+            if (column := owner_column(cls)) is not None
+            for obj in src.session.query(cls).filter(column == user)
+        ]
+        for obj in objs:
+            src.session.expunge(obj)
+            make_transient(obj)  # keeps the primary key and every loaded column
+            dst.session.add(obj)
+        dst.commit()
+
+        with self.engine.begin() as conn:
+            conn.execute(shard_directory.delete().where(shard_directory.c.user == user))
+            conn.execute(shard_directory.insert(), {"user": user, "shard": target})
+        self.routes[user] = target
+
+        for obj in objs:
+            table = obj.__mapper__.local_table
+            pk = obj.__mapper__.primary_key[0]
+            src.session.execute(
+                delete(table).where(pk == getattr(obj, pk_key(type(obj))))
+            )
+        src.commit()
+        return len(objs)
@@ -0,0 +1,307 @@
+"""
+Fast restart for DataHandler: a binary snapshot of every table plus an append-only
+journal of everything committed since. Loading both skips hydrating the whole db
+through the ORM query path. Every commit also stores the last journal sequence number
+in the db, in the same transaction, so a journal that missed a commit is noticed.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import pickle
+import struct
+import time
+from datetime import datetime as dt, timedelta
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, event, func, select, update
+from sqlalchemy.orm import Mapper, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from core.data.backend import SQLAlchemyBackend
+from core.data.base import Base
+
+if TYPE_CHECKING:
+    from core.data.handler import DataHandler
+
+Row = Tuple[Any, ...]
+_header = struct.Struct("<I")
+
+metadata = MetaData()
+
+journal_seq = Table(
+    "journal_seq",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("seq", Integer),
+)
+
+
+def mappers() -> Dict[str, Mapper[Any]]:
+    return {
+        mapper.class_.__tablename__: mapper
+        for mapper in Base.registry.mappers  # type: ignore
+        if hasattr(mapper.class_, "__tablename__")
+    }
+
+
+def schema() -> Dict[str, List[str]]:
+    return {
+        table: [prop.key for prop in mapper.column_attrs]
+        for table, mapper in mappers().items()
+    }
+
+
+def to_row(mapper: Mapper[Any], obj: Any) -> Row:
+    return tuple(obj.__dict__.get(prop.key) for prop in mapper.column_attrs)
+
+
+def pk_index(mapper: Mapper[Any]) -> int:
+    pk = mapper.get_property_by_column(mapper.primary_key[0]).key
+    return [prop.key for prop in mapper.column_attrs].index(pk)
+
+
+def materialize(session: Any, mapper: Mapper[Any], row: Row) -> Any:
+    """
+    Builds the object a query would have loaded for this row, and attaches it to the
+    session as persistent without issuing a SELECT.
+    """
+    identity = mapper.identity_key_from_primary_key((row[pk_index(mapper)],))
+    if (existing := session.identity_map.get(identity)) is not None:
+        return existing
+    obj = mapper.class_manager.new_instance()
+    for prop, value in zip(mapper.column_attrs, row):
+        set_committed_value(obj, prop.key, value)
+    make_transient_to_detached(obj)
+    session.add(obj)
+    if hasattr(obj, "init_on_load"):
+        obj.init_on_load()
+    return obj
+
+
+class FastRestart:
+    """
+    Journals every committed insert/update/delete through session events, and writes
+    a snapshot once the journal gets long or old. Each journal record carries a
+    sequence number, so records already folded into the snapshot are skipped.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        backend: SQLAlchemyBackend,
+        snapshot_interval: timedelta = timedelta(hours=1),
+        max_journal_records: int = 10_000,
+    ) -> None:
+        self.snapshot_path = os.path.join(directory, "data.snapshot")
+        self.journal_path = os.path.join(directory, "data.journal")
+        self.snapshot_interval = snapshot_interval.total_seconds()
+        self.max_journal_records = max_journal_records
+        self.journal_records = 0
+        self.last_snapshot = time.monotonic()
+        self.pending: List[Tuple[str, str, Row]] = []
+        self.journal: Optional[BinaryIO] = None
+        self.session = backend.session
+        metadata.create_all(backend.engine, checkfirst=True)
+        with backend.engine.begin() as conn:
+            if conn.execute(select(journal_seq.c.seq)).first() is None:
+                conn.execute(journal_seq.insert(), {"id": 1, "seq": 0})
+        self.seq = self._db_seq()
+        event.listen(self.session, "after_flush", self._after_flush)
+        event.listen(self.session, "after_commit", self._after_commit)
+        event.listen(self.session, "after_soft_rollback", self._after_rollback)
+
+    def close(self) -> None:
+        event.remove(self.session, "after_flush", self._after_flush)
+        event.remove(self.session, "after_commit", self._after_commit)
+        event.remove(self.session, "after_soft_rollback", self._after_rollback)
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def _after_flush(self, flushed: Any, _: Any) -> None:
+        # deletes go first, so a primary key deleted and added back in the same flush
+        # is replayed as present
+        pending = len(self.pending)
+        for op, objs in (
+            ("delete", flushed.deleted),
+            ("insert", flushed.new),
+            ("update", flushed.dirty),
+        ):
+            for obj in objs:
+                mapper = obj.__mapper__
+                if op == "update" and not flushed.is_modified(obj):
+                    continue
+                self.pending.append(
+                    (op, mapper.class_.__tablename__, to_row(mapper, obj))
+                )
+        if len(self.pending) > pending:
+            # what the journal will be at once this commits, committed along with it
+            flushed.connection().execute(
+                update(journal_seq).values(seq=self.seq + len(self.pending))
+            )
+
+    def _after_commit(self, _: Any) -> None:
+        if not self.pending:
+            return
+        if self.journal is None:
+            self.journal = open(self.journal_path, "ab")
+        for op, table, row in self.pending:
+            self.seq += 1
+            payload = pickle.dumps((self.seq, op, table, row), pickle.HIGHEST_PROTOCOL)
+            self.journal.write(_header.pack(len(payload)) + payload)
+        self.journal.flush()
+        self.journal_records += len(self.pending)
+        self.pending.clear()
+
+    def _after_rollback(self, *_: Any) -> None:
+        self.pending.clear()
+
+    def maybe_snapshot(self, data: DataHandler) -> None:
+        if self.journal_records and (
+            self.journal_records >= self.max_journal_records
+            or time.monotonic() - self.last_snapshot >= self.snapshot_interval
+        ):
+            self.write_snapshot(data)
+
+    def write_snapshot(self, data: DataHandler) -> None:
+        """
+        Dumps the in-memory state, including when each repeatable task last went off.
+        Written to a temp file first so a crash never leaves a torn snapshot.
+        """
+        table_mappers = mappers()
+        tables: Dict[str, List[Row]] = {table: [] for table in table_mappers}
+        ledger: Dict[str, Dict[Any, float]] = {table: {} for table in table_mappers}
+        for obj in data.persisted():
+            mapper = obj.__mapper__  # type: ignore
+            table = mapper.class_.__tablename__
+            row = to_row(mapper, obj)
+            tables[table].append(row)
+            if (last_activated := obj.__dict__.get("_last_activated")) is not None:
+                ledger[table][row[pk_index(mapper)]] = last_activated.timestamp()
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {
+                    "seq": self.seq,
+                    "schema": schema(),
+                    "tables": tables,
+                    "ledger": ledger,
+                },
+                f,
+                pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, self.snapshot_path)
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        open(self.journal_path, "wb").close()
+        self.journal_records = 0
+        self.last_snapshot = time.monotonic()
+
+    def _replay(self, seq: int, tables: Dict[str, Dict[Any, Row]]) -> None:
+        if not os.path.exists(self.journal_path):
+            return
+        table_mappers = mappers()
+        with open(self.journal_path, "rb") as f:
+            buf = f.read()
+        ptr = 0
+        while ptr + _header.size <= len(buf):
+            (size,) = _header.unpack_from(buf, ptr)
+            if ptr + _header.size + size > len(buf):
+                break  # torn final record
+            rec_seq, op, table, row = pickle.loads(
+                buf[ptr + _header.size : ptr + _header.size + size]
+            )
+            ptr += _header.size + size
+            self.seq = max(self.seq, rec_seq)
+            if rec_seq <= seq:
+                continue
+            self.journal_records += 1
+            pk = row[pk_index(table_mappers[table])]
+            if op == "delete":
+                tables[table].pop(pk, None)
+            else:
+                tables[table][pk] = row
+
+    def _db_seq(self) -> int:
+        return self.session.execute(select(journal_seq.c.seq)).scalar_one()
+
+    def _matches_db(self, tables: Dict[str, Dict[Any, Row]]) -> bool:
+        """
+        Whether the journal has every commit the db has, and a cheap sanity check that
+        nothing wrote to the db behind the session's back.
+        """
+        if self._db_seq() != self.seq:
+            return False
+        for table, mapper in mappers().items():
+            pk_col = mapper.primary_key[0]
+            count, max_pk = self.session.execute(
+                select(func.count(), func.max(pk_col)).select_from(mapper.local_table)
+            ).one()
+            rows = tables.get(table, {})
+            if count != len(rows) or max_pk != max(rows, default=None):
+                return False
+        return True
+
+    def _read(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[Any, Row]]]]:
+        """The snapshot with the journal replayed onto it, if it matches the db."""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mm:
+                state = pickle.loads(mm)
+        except Exception:
+            return None
+        if state["schema"] != schema():
+            return None
+
+        table_mappers = mappers()
+        tables: Dict[str, Dict[Any, Row]] = {
+            table: {row[pk_index(table_mappers[table])]: row for row in rows}
+            for table, rows in state["tables"].items()
+        }
+        self.seq = state["seq"]
+        self._replay(state["seq"], tables)
+        if not self._matches_db(tables):
+            return None
+        return state, tables
+
+    def _discard(self) -> None:
+        """
+        Drops a snapshot and journal that don't match the db, so a later restart can't
+        pick them up again, and carries on numbering from the db's sequence number.
+        """
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        for path in (self.snapshot_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.seq = self._db_seq()
+        self.journal_records = 0
+
+    def load(self) -> Optional[Dict[str, List[Any]]]:
+        """
+        Returns the objects of every table, with their activation ledger restored, or
+        None if there is no usable snapshot and the caller should load from the db.
+        """
+        if (read := self._read()) is None:
+            self._discard()
+            return None
+        state, tables = read
+
+        table_mappers = mappers()
+        objs: Dict[str, List[Any]] = {}
+        for table, rows in tables.items():
+            objs[table] = []
+            for pk, row in rows.items():
+                obj = materialize(self.session, table_mappers[table], row)
+                if (stamp := state["ledger"][table].get(pk)) is not None:
+                    object.__setattr__(obj, "_last_activated", dt.fromtimestamp(stamp))
+                objs[table].append(obj)
+        return objs
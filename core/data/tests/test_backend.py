@@ -0,0 +1,170 @@
+import gc
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import tempfile
+from datetime import time as Time, timedelta
+from typing import Any, List, cast
+from core.data.backend import MemoryBackend, SQLAlchemyBackend, SQLiteBackend
+from core.data.handler import AtomicDBDict, AtomicDBList, DBLock
+from core.data.writable import SingleAlert, Timezone, UserTask, Wakeup
+from core.timer import now
+from core.utils.constants import testmogus_id
+from custom_typing.protocols import StorageBackend
+from disc.tests.main import Test
+
+
+def backends() -> List[StorageBackend]:
+    """Every backend has to pass the same conformance tests."""
+    return [
+        MemoryBackend(),
+        SQLiteBackend(os.path.join(tempfile.mkdtemp(), "data.db")),
+        SQLAlchemyBackend("sqlite://"),
+    ]
+
+
+class TestBackend(Test):
+    async def test_backend_round_trip(self) -> None:
+        for backend in backends():
+            task = UserTask(testmogus_id, "do laundry")
+            backend.add(task)
+            backend.commit()
+            self.assert_true(task._id is not None)
+            self.assert_equal(backend.load(UserTask), [task])
+
+            backend.delete(task)
+            backend.commit()
+            self.assert_equal(backend.load(UserTask), [])
+
+    async def test_backend_collections(self) -> None:
+        for backend in backends():
+            user_tasks = AtomicDBList[UserTask](backend=backend)
+            user_tasks.append(first := UserTask(testmogus_id, "do laundry"))
+            user_tasks.append(UserTask(testmogus_id, "take out trash"))
+            user_tasks.remove(first)
+            self.assert_equal(
+                [x.desc for x in backend.load(UserTask)], ["take out trash"]
+            )
+
+            timezones = AtomicDBDict[int, Timezone](tz=True, backend=backend)
+            timezones[testmogus_id] = Timezone(testmogus_id, "US/Eastern")
+            timezones[testmogus_id] = Timezone(testmogus_id, "US/Pacific")
+            self.assert_equal([x._tz for x in backend.load(Timezone)], ["US/Pacific"])
+
+            timezones.clear()
+            self.assert_equal(backend.load(Timezone), [])
+
+    async def test_backend_range(self) -> None:
+        for backend in backends():
+            soon = SingleAlert("soon", testmogus_id, 0, now() + timedelta(hours=1))
+            later = SingleAlert("later", testmogus_id, 0, now() + timedelta(hours=3))
+            backend.add(soon)
+            backend.add(later)
+            backend.commit()
+            self.assert_equal(
+                backend.range(
+                    SingleAlert,
+                    "_next_activation",
+                    now().timestamp(),
+                    (now() + timedelta(hours=2)).timestamp(),
+                ),
+                [soon],
+            )
+
+    async def test_backend_replace(self) -> None:
+        for backend in backends():
+            wakeups = AtomicDBDict[int, Wakeup](backend=backend)
+            wakeups[testmogus_id] = Wakeup(testmogus_id, Time(hour=10), 0)
+            pk = wakeups[testmogus_id]._Task__id
+            wakeups[testmogus_id] = Wakeup(testmogus_id, Time(hour=10), 0, True)
+
+            self.assert_equal(wakeups[testmogus_id]._Task__id, pk)
+            self.assert_equal(backend.load(Wakeup), [wakeups[testmogus_id]])
+            self.assert_true(backend.load(Wakeup)[0].disabled)
+
+    async def test_concurrent_mutation(self) -> None:
+        user_tasks = AtomicDBList[UserTask](backend=MemoryBackend())
+        user_tasks.append(UserTask(testmogus_id, "do laundry"))
+        user_tasks.append(trash := UserTask(testmogus_id, "take out trash"))
+
+        async def keep(task: UserTask) -> bool:
+            # a command landing mid-dispatch used to deadlock on the list's lock
+            user_tasks.append(UserTask(testmogus_id, "walk dog"))
+            user_tasks.discard(trash)
+            return cast(str, task.desc) != "do laundry"
+
+        await user_tasks.async_filter(keep)
+        self.assert_equal([x.desc for x in user_tasks], ["walk dog", "walk dog"])
+        self.assert_true(not user_tasks.discard(trash))
+
+    async def test_threads(self) -> None:
+        # sqlite connections left over from other tests can only be closed by the
+        # thread that opened them, so don't let the workers garbage collect them
+        gc.collect()
+        backend = MemoryBackend()
+        user_tasks = AtomicDBList[UserTask](backend=backend)
+
+        def work(user: int) -> None:
+            for i in range(50):
+                user_tasks.append(task := UserTask(user, f"task {i}"))
+                if i % 2:
+                    user_tasks.remove(task)
+
+        def bulk() -> None:
+            # DBLock is the collections' own lock, so holding it while they're
+            # mutated from other threads can't deadlock
+            with DBLock(backend):
+                for i in range(50):
+                    user_tasks.append(UserTask(testmogus_id, f"bulk {i}"))
+
+        with ThreadPoolExecutor(8) as pool:
+            jobs = [pool.submit(bulk), *(pool.submit(work, i) for i in range(8))]
+            for job in jobs:
+                job.result(5)
+        self.assert_equal(len(user_tasks), 8 * 25 + 50)
+        self.assert_equal(len(backend.load(UserTask)), 8 * 25 + 50)
+
+    async def test_snapshot_during_mutation(self) -> None:
+        timezones = AtomicDBDict[Any, Timezone](backend=MemoryBackend())
+        looking_up, resume = threading.Event(), threading.Event()
+
+        class SlowKey(int):
+            hashed = 0
+
+            def __hash__(self) -> int:
+                SlowKey.hashed += 1
+                if SlowKey.hashed == 1:  # the dict lookup, under the lock
+                    looking_up.set()
+                    resume.wait(5)
+                return int.__hash__(self)
+
+        with ThreadPoolExecutor(2) as pool:
+            setting = pool.submit(
+                timezones.__setitem__,
+                SlowKey(testmogus_id),
+                Timezone(testmogus_id, "US/Eastern"),
+            )
+            looking_up.wait(5)
+            during = pool.submit(timezones.snapshot)
+            # waits for the mutation instead of copying half of it
+            self.assert_true(not wait([during], 0.1).done)
+            resume.set()
+            setting.result()
+            self.assert_equal(list(during.result()), [testmogus_id])
+        self.assert_equal(timezones.snapshot_version, timezones.version)
+
+    async def test_unsupported_methods(self) -> None:
+        user_tasks = AtomicDBList[UserTask]([], backend=MemoryBackend())
+        timezones = AtomicDBDict[int, Timezone](backend=MemoryBackend())
+        for call in (
+            user_tasks.sort,
+            user_tasks.reverse,
+            lambda: user_tasks.__delitem__(0),
+            lambda: timezones.pop(testmogus_id),
+            lambda: timezones.update({}),
+        ):
+            try:
+                call()
+                self.assert_true(False)
+            except NotImplementedError:
+                pass
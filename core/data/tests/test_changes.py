@@ -0,0 +1,48 @@
+import asyncio
+
+from core.data.writable import PeriodicAlert
+from core.start import data
+from core.utils.constants import testmogus_id
+from core.utils.exceptions import ChangeStreamLagged
+from disc.tests.main import Test
+from disc.tests.utils import user_says
+
+
+class TestChanges(Test):
+    async def test_change_stream(self) -> None:
+        sub = data.changes.subscribe(collections=["tasks", "timezones"])
+        try:
+            await user_says("daily 10am wake up")
+            change = await asyncio.wait_for(sub.get(), 1)
+            self.assert_equal((change.op, change.collection), ("insert", "tasks"))
+            self.assert_is_instance(change.new, PeriodicAlert)
+
+            old = data.timezones[testmogus_id]
+            await user_says("timezone US/Pacific")
+            change = await asyncio.wait_for(sub.get(), 1)
+            self.assert_equal(
+                (change.op, change.key, change.old), ("update", testmogus_id, old)
+            )
+
+            await user_says("delete reminder 1")
+            change = await asyncio.wait_for(sub.get(), 1)
+            self.assert_equal((change.op, change.new), ("delete", None))
+            self.assert_equal(sub.get_nowait(), None)
+        finally:
+            sub.close()
+
+    async def test_change_stream_lag(self) -> None:
+        sub = data.changes.subscribe(max_size=1, collections=["tasks"])
+        try:
+            await user_says("daily 10am wake up")
+            await user_says("daily 11am wake up")
+            try:
+                sub.get_nowait()
+                self.assert_true(False)
+            except ChangeStreamLagged:
+                pass
+            await user_says("daily 12pm wake up")
+            self.assert_equal(sub.get_nowait().op, "insert")  # type: ignore
+        finally:
+            sub.close()
+        self.assert_equal(data.changes.subscriptions, [])
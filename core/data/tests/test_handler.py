@@ -1,7 +1,17 @@
-from typing import Any, Dict, List
+from datetime import timedelta, time as Time
+import os
+import tempfile
+from typing import Any, Dict, List, cast
+from sqlalchemy import event
+from core.data.backend import SQLAlchemyBackend
+from core.data.db import backend
+from core.data.snapshot import FastRestart, to_row
+from core.data.writable import PeriodicAlert
+from core.timer import now
 from disc.tests.main import Test
 from core.start import data
-from disc.tests.utils import user_says
+from disc.tests.utils import get_messages_at_time, user_says
+from core.utils.constants import testmogus_id
 
 
 def attrs(y: List[Any]) -> List[Dict[Any, Any]]:
@@ -18,6 +28,28 @@ def attrs(y: List[Any]) -> List[Dict[Any, Any]]:
     ]
 
 
+def rows() -> List[Any]:
+    return sorted(
+        (
+            (type(x).__name__, to_row(x.__mapper__, x))  # type: ignore
+            for x in (
+                *data.tasks,
+                *data.user_tasks,
+                *data.timezones.values(),
+                *data.wakeup.values(),
+            )
+        ),
+        key=repr,
+    )
+
+
+def single_db() -> SQLAlchemyBackend:
+    """Fast restart needs the db in one place, see `shards` in constants."""
+    if not isinstance(backend, SQLAlchemyBackend):
+        raise TypeError("Fast restart tests need a single db.")
+    return backend
+
+
 class TestHandler(Test):
     def reload_data(self) -> None:
         object.__delattr__(data, "tasks")
@@ -47,3 +79,65 @@ class TestHandler(Test):
 
         await user_says("subscribe alerts")
         self.check_save_load()
+
+    async def test_next_activation(self) -> None:
+        await user_says("daily 8am wake up")
+        alert = cast(PeriodicAlert, data.tasks[0])
+        first = alert.first_activation
+        self.assert_equal(alert._next_activation, first.timestamp())
+
+        due = data.due_tasks(now(), first + timedelta(seconds=1))
+        self.assert_equal([x for x in due if isinstance(x, PeriodicAlert)], [alert])
+
+        # 12 UTC is 8 EST
+        await get_messages_at_time(Time(hour=12), expected_messages=1)
+        self.assert_equal(
+            alert._next_activation, (first + timedelta(days=1)).timestamp()
+        )
+        due = data.due_tasks(now(), now() + timedelta(hours=1))
+        self.assert_equal([x for x in due if isinstance(x, PeriodicAlert)], [])
+
+    async def test_fast_restart(self) -> None:
+        fast_restart = FastRestart(tempfile.mkdtemp(), single_db())
+        data.fast_restart = fast_restart
+        try:
+            fast_restart.write_snapshot(data)
+            last_activated = data.wakeup[testmogus_id]._last_activated
+
+            await user_says("daily 10am wake up")
+            await user_says("task do laundry")
+            await user_says("timezone US/Pacific")
+            orig_rows = rows()
+
+            # make sure objects are rebuilt from the files
+            single_db().session.expunge_all()
+            self.reload_data()
+            self.assert_equal(rows(), orig_rows)
+            self.assert_geq(fast_restart.journal_records, 3)
+            self.assert_equal(data.wakeup[testmogus_id]._last_activated, last_activated)
+            self.assert_equal(data.timezones[testmogus_id].tz.zone, "US/Pacific")
+        finally:
+            fast_restart.close()
+            data.fast_restart = None
+
+    async def test_fast_restart_lost_commit(self) -> None:
+        fast_restart = FastRestart(tempfile.mkdtemp(), single_db())
+        data.fast_restart = fast_restart
+        try:
+            fast_restart.write_snapshot(data)
+            await user_says("daily 10am wake up")
+            # crash after the db committed the update, before the journal got it
+            event.remove(
+                single_db().session, "after_commit", fast_restart._after_commit
+            )
+            await user_says("timezone US/Pacific")
+            event.listen(
+                single_db().session, "after_commit", fast_restart._after_commit
+            )
+            fast_restart.pending.clear()
+
+            self.assert_equal(fast_restart.load(), None)
+            self.assert_true(not os.path.exists(fast_restart.snapshot_path))
+        finally:
+            fast_restart.close()
+            data.fast_restart = None
@@ -0,0 +1,65 @@
+from datetime import datetime as dt, timedelta
+
+from sqlalchemy import create_engine, func, select
+
+from core.data.history import HOUR, MINUTE, ActivationHistory, activation_history
+from core.data.writable import SingleAlert
+from core.utils.constants import testmogus_id
+from disc.tests.main import Test
+
+
+class TestHistory(Test):
+    async def test_history_rollups(self) -> None:
+        engine = create_engine("sqlite://")
+        history = ActivationHistory(engine)
+        base = dt(2030, 1, 1, 10)
+        alert = SingleAlert("wake up", testmogus_id, 0, base)
+        for seconds in (10, 50, 80):
+            fired = base + timedelta(seconds=seconds)
+            history.record(alert, base.timestamp(), fired)
+
+        history.maintain(base + timedelta(minutes=2, seconds=5))
+        self.assert_equal(
+            history.counts(base, base + timedelta(hours=1), MINUTE),
+            {base: 2, base + timedelta(minutes=1): 1},
+        )
+
+        # picks up where the last one left off instead of counting again
+        history = ActivationHistory(engine)
+        history.maintain(base + timedelta(hours=2, seconds=30))
+        self.assert_equal(
+            history.counts(base, base + timedelta(days=1), MINUTE)[base], 2
+        )
+        self.assert_equal(history.counts(base, base + timedelta(days=1)), {base: 3})
+
+        history.maintain(base + timedelta(days=8))
+        with engine.connect() as conn:
+            raw = conn.execute(select(func.count()).select_from(activation_history))
+            self.assert_equal(raw.scalar(), 0)
+        self.assert_equal(
+            history.counts(base, base + timedelta(days=1), HOUR), {base: 3}
+        )
+        engine.dispose()  # sqlite connections can only be closed by their thread
+
+    async def test_history_batches(self) -> None:
+        engine = create_engine("sqlite://")
+        history = ActivationHistory(engine, batch_size=3)
+        base = dt(2030, 1, 1, 10)
+        alert = SingleAlert("wake up", testmogus_id, 0, base)
+
+        def written() -> int:
+            with engine.connect() as conn:
+                query = select(func.count()).select_from(activation_history)
+                return conn.execute(query).scalar_one()
+
+        history.maintain(base)
+        history.record(alert, base.timestamp(), base)
+        # ticks in between don't write every time
+        history.maintain(base + timedelta(seconds=1))
+        self.assert_equal(written(), 0)
+        history.maintain(base + timedelta(seconds=10))
+        self.assert_equal(written(), 1)
+        for _ in range(3):
+            history.record(alert, base.timestamp(), base + timedelta(seconds=11))
+        self.assert_equal(written(), 4)
+        engine.dispose()
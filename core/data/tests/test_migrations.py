@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import tempfile
+from datetime import timedelta
+from typing import List
+
+from sqlalchemy import text
+
+from core.data.backend import SQLiteBackend
+from core.data.writable import PeriodicAlert, SingleAlert
+from core.timer import now
+from core.utils.constants import testmogus_id
+from disc.tests.main import Test
+
+
+class TestMigrations(Test):
+    async def test_migrate_columns(self) -> None:
+        path = os.path.join(tempfile.mkdtemp(), "data.db")
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE timezone (_id INTEGER PRIMARY KEY)")
+            conn.execute(f"INSERT INTO timezone VALUES ({testmogus_id})")
+
+        backend = SQLiteBackend(path)
+        self.assert_equal(backend.migrator.applied(), [1])
+        with sqlite3.connect(path) as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(timezone)")]
+        self.assert_equal(columns, ["_id", "_tz"])
+        backend.engine.dispose()
+
+    async def test_migrate_backfill(self) -> None:
+        path = os.path.join(tempfile.mkdtemp(), "data.db")
+        backend = SQLiteBackend(path)
+        alerts = [
+            PeriodicAlert("wake up", testmogus_id, 0, timedelta(days=1), now()),
+            SingleAlert("trash", testmogus_id, 0, now() + timedelta(hours=1)),
+        ]
+        for alert in alerts:
+            backend.add(alert)
+        backend.commit()
+        with backend.engine.begin() as conn:
+            for table in ("periodic_alert", "single_alert"):
+                conn.execute(text(f"UPDATE {table} SET _next_activation = NULL"))
+            conn.execute(text("DELETE FROM schema_version WHERE version = 2"))
+
+        reports: List[str] = []
+        self.assert_equal([x.version for x in backend.migrator.pending()], [2])
+        await backend.migrator.backfill(batch_size=1, pause=0, report=reports.append)
+        self.assert_equal(len(reports), 2)
+        self.assert_equal(backend.migrator.progress[2], (2, 2))
+        self.assert_equal(backend.migrator.applied(), [1, 2])
+        with backend.engine.connect() as conn:
+            self.assert_equal(
+                sorted(
+                    conn.execute(
+                        text(
+                            "SELECT _next_activation FROM periodic_alert UNION ALL "
+                            "SELECT _next_activation FROM single_alert"
+                        )
+                    ).scalars()
+                ),
+                sorted(x._next_activation for x in alerts),
+            )
+        backend.engine.dispose()
@@ -0,0 +1,56 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from core.data.backend import MemoryBackend
+from core.data.reminder_msgs import ReminderMessages
+from core.data.writable import ReminderMessage
+from core.timer import now
+from core.utils.constants import testmogus_id
+from disc.tests.main import Test
+
+
+class TestReminderMessages(Test):
+    async def test_reminder_msgs_lru(self) -> None:
+        reminder_msgs = ReminderMessages(max_size=2)
+        reminder_msgs.add(1, testmogus_id, "wake up")
+        reminder_msgs.add(2, testmogus_id, "trash")
+        self.assert_true(1 in reminder_msgs)  # 2 is now least recently used
+        reminder_msgs.add(3, testmogus_id, "gamine")
+
+        self.assert_len(reminder_msgs, 2)
+        self.assert_true(2 not in reminder_msgs)
+        self.assert_has_attrs(reminder_msgs.get(1), {"msg": "wake up"})
+
+    async def test_reminder_msgs_ttl(self) -> None:
+        reminder_msgs = ReminderMessages(ttl=timedelta(hours=1))
+        reminder_msgs.add(1, testmogus_id, "wake up")
+        now.suppose_it_is(now() + timedelta(hours=2))
+
+        self.assert_equal(reminder_msgs.get(1), None)
+        self.assert_len(reminder_msgs, 0)
+
+    async def test_reminder_msgs_persist(self) -> None:
+        backend = MemoryBackend()
+        reminder_msgs = ReminderMessages(ttl=timedelta(hours=1), backend=backend)
+        reminder_msgs.add(1, testmogus_id, "wake up")
+        reminder_msgs.add(2, testmogus_id, "trash")
+        now.suppose_it_is(now() + timedelta(minutes=30))
+        reminder_msgs.add(3, testmogus_id, "gamine")
+
+        now.suppose_it_is(now() + timedelta(minutes=45))
+        restarted = ReminderMessages(ttl=timedelta(hours=1), backend=backend)
+        restarted.load(backend.load(ReminderMessage))
+        self.assert_len(restarted, 1)
+        self.assert_has_attrs(restarted.get(3), {"msg": "gamine"})
+        self.assert_len(backend.load(ReminderMessage), 1)
+
+    async def test_reminder_msgs_commit_on_evict(self) -> None:
+        backend = MemoryBackend()
+        with patch.object(backend, "commit") as commit:
+            reminder_msgs = ReminderMessages(max_size=2, backend=backend)
+            reminder_msgs.add(1, testmogus_id, "wake up")
+            reminder_msgs.add(2, testmogus_id, "trash")
+            self.assert_true(1 in reminder_msgs)
+            self.assert_equal(commit.call_count, 0)
+            reminder_msgs.add(3, testmogus_id, "gamine")
+            self.assert_equal(commit.call_count, 1)
@@ -0,0 +1,82 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from sqlalchemy import create_engine, inspect
+
+from core.data.handler import AtomicDBDict, AtomicDBList, DBLock
+from core.data.history import ActivationHistory
+from core.data.sharding import ShardedBackend
+from core.data.writable import SingleAlert, Timezone, UserTask
+from core.timer import now
+from disc.tests.main import Test
+
+
+class TestSharding(Test):
+    async def test_sharding(self) -> None:
+        path = tempfile.mkdtemp()
+        backend = ShardedBackend(path, shards=3)
+        user_tasks = AtomicDBList[UserTask](backend=backend)
+        timezones = AtomicDBDict[int, Timezone](tz=True, backend=backend)
+        for user in range(6):
+            user_tasks.append(UserTask(user, f"task {user}"))
+            timezones[user] = Timezone(user, "US/Eastern")
+
+        # users are placed by `user % shards`, which hash() only agrees with for
+        # small non-negative ints
+        self.assert_equal([backend.shard_of(x) for x in (-1, 2**61)], [2, 2])
+
+        # each shard only has its own users, and ids are unique across shards
+        for i, shard in enumerate(backend.shards):
+            self.assert_equal(
+                sorted(x.user_id for x in shard.load(UserTask)), [i, i + 3]
+            )
+        self.assert_equal(
+            sorted(x._id for x in backend.load(UserTask)), list(range(1, 7))
+        )
+
+        alert = SingleAlert("wake up", 4, 0, now() + timedelta(hours=1))
+        backend.add(alert)
+        backend.commit()
+        self.assert_equal(
+            backend.range(
+                SingleAlert,
+                "_next_activation",
+                now().timestamp(),
+                (now() + timedelta(hours=2)).timestamp(),
+            ),
+            [alert],
+        )
+
+        with DBLock(backend):
+            self.assert_equal(backend.move_user(4, 0), 3)
+        self.assert_equal(backend.sizes(), [7, 2, 4])
+        timezones[4] = Timezone(4, "US/Pacific")  # still routed after the move
+        user_tasks.remove(next(x for x in user_tasks if x.user_id == 4))
+
+        reopened = ShardedBackend(path, shards=3)
+        self.assert_equal(reopened.shard_of(4), 0)
+        self.assert_equal(
+            [x._tz for x in reopened.load(Timezone) if x._id == 4], ["US/Pacific"]
+        )
+        self.assert_equal(len(reopened.load(UserTask)), 5)
+        self.assert_equal(reopened.sizes(), [6, 2, 4])
+        for shard in (*backend.shards, *reopened.shards):
+            shard.engine.dispose()
+
+    async def test_unsharded_tables(self) -> None:
+        path = tempfile.mkdtemp()
+        backend = ShardedBackend(path, shards=2)
+        history = ActivationHistory(backend.engine)
+        history.record(SingleAlert("wake up", 4, 0, now()), None, now())
+        history.flush()
+
+        # the history isn't per user, so it goes to the directory and not a shard
+        directory = create_engine(f"sqlite:///{os.path.join(path, 'directory.db')}")
+        self.assert_true("activation_history" in inspect(directory).get_table_names())
+        for shard in backend.shards:
+            self.assert_true(
+                "activation_history" not in inspect(shard.engine).get_table_names()
+            )
+        for engine in (directory, backend.engine, *(x.engine for x in backend.shards)):
+            engine.dispose()
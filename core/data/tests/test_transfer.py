@@ -0,0 +1,98 @@
+import io
+import json
+from datetime import timedelta
+from typing import List, Tuple
+from core.data.transfer import export_alerts, import_alerts
+from core.data.writable import Alert, MonthlyAlert, PeriodicAlert, SingleAlert
+from core.start import data
+from core.timer import now
+from core.utils.constants import testmogus_id
+from core.utils.exceptions import BulkImportException
+from disc.tests.main import Test
+
+
+def alerts() -> List[Tuple[str, str, float]]:
+    return sorted(
+        (type(x).__name__, str(x.msg), float(x._next_activation))  # type: ignore
+        for x in data.tasks
+        if isinstance(x, Alert)
+    )
+
+
+class TestTransfer(Test):
+    async def test_import_csv(self) -> None:
+        at = (now() + timedelta(days=1)).replace(microsecond=0).isoformat()
+        rows = [
+            "kind,user,channel,msg,at,every,day,time,tag",
+            f"single,{testmogus_id},1,wake up,{at},,,,",
+            f"periodic,{testmogus_id},1,brush teeth,{at},86400,,,[daily]",
+            f"monthly,{testmogus_id},1,pay rent,,,1,12:00,[monthly]",
+        ]
+        imported = import_alerts(data, io.StringIO("\n".join(rows)), "csv")
+        self.assert_equal(
+            [type(x) for x in imported], [SingleAlert, PeriodicAlert, MonthlyAlert]
+        )
+        self.assert_equal(len(alerts()), 3)
+
+    async def test_import_invalid(self) -> None:
+        rows = [
+            '{"msg": "wake up", "at": "2000-01-01T00:00:00"}',
+            '{"msg": "", "at": "2100-01-01T00:00:00"}',
+            '{"kind": "periodic", "msg": "x", "at": "2100-01-01", "every": 5}',
+            "not json",
+            "[1, 2]",
+            '"x"',
+        ]
+        try:
+            import_alerts(data, io.StringIO("\n".join(rows)), "json", testmogus_id, 1)
+            self.assert_true(False)
+        except BulkImportException as e:
+            self.assert_equal([row for row, _ in e.errors], [1, 2, 3, 4, 5, 6])
+            self.assert_equal(e.errors[5], (6, "expected an object, got str"))
+        self.assert_equal(alerts(), [])
+
+    async def test_import_malformed(self) -> None:
+        at = (now() + timedelta(days=1)).replace(microsecond=0).isoformat()
+        files = {
+            "json": '[{"msg": "wake up", "at": "2100-01-01T00:00:00"},\n',
+            "csv": "\n".join(
+                [
+                    "kind,user,channel,msg,at,every,day,time,tag",
+                    f'single,{testmogus_id},1,"{"x" * 200_000}",{at},,,,',
+                    f"single,{testmogus_id},1,wake up,{at},,,,",
+                    f"single,{testmogus_id},1,,{at},,,,",
+                ]
+            ),
+        }
+        errors = {
+            "json": [(1, "invalid json: Expecting value at line 2")],
+            "csv": [
+                (1, "invalid csv: field larger than field limit (131072)"),
+                (3, "missing msg"),
+            ],
+        }
+        for fmt, text in files.items():
+            try:
+                import_alerts(data, io.StringIO(text), fmt, testmogus_id, 1)
+                self.assert_true(False)
+            except BulkImportException as e:
+                self.assert_equal(e.errors, errors[fmt])
+        self.assert_equal(alerts(), [])
+
+    async def test_round_trip(self) -> None:
+        at = (now() + timedelta(days=1)).replace(microsecond=0)
+        rows = [
+            {"msg": "wake up; now", "at": at.isoformat()},
+            {"kind": "periodic", "msg": "brush", "at": at.isoformat(), "every": 604800},
+            {"kind": "monthly", "msg": "pay rent", "day": 28, "time": "09:30:00"},
+        ]
+        import_alerts(data, io.StringIO(json.dumps(rows)), "json", testmogus_id, 1)
+        orig = alerts()
+
+        for fmt in ("csv", "json", "ics"):
+            out = io.StringIO()
+            export_alerts(data, out, fmt, user=testmogus_id)
+            data.tasks.clear()
+            out.seek(0)
+            import_alerts(data, out, fmt)
+            self.assert_equal(alerts(), orig)
@@ -0,0 +1,335 @@
+"""
+Bulk import and export of alerts as CSV, JSON (an array, or one object per line) or
+iCalendar VEVENTs. Imports validate each row as it streams in and are added in a
+single transaction; exports stream rows out of a snapshot of the tasks.
+
+CSV and JSON rows have the columns in `fields`, with all times in UTC:
+    kind     single | periodic | monthly
+    user     discord user id
+    channel  discord channel id
+    msg      what to remind about
+    at       single: when it goes off; periodic: first activation (ISO 8601)
+    every    periodic: seconds between activations, 86400 or 604800
+    day      monthly: day of the month
+    time     monthly: time of day (HH:MM[:SS])
+    tag      descriptor tag, e.g. [daily]
+"""
+
+import csv
+import itertools
+import json
+import re
+from datetime import datetime as dt, time as Time, timedelta
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+import pytz
+
+from core.data.handler import DataHandler
+from core.data.writable import Alert, MonthlyAlert, PeriodicAlert, SingleAlert
+from core.timer import now
+from core.utils.constants import banned_users
+from core.utils.exceptions import BulkImportException
+
+Row = Dict[str, Any]
+fields = ("kind", "user", "channel", "msg", "at", "every", "day", "time", "tag")
+periods = {86400: "[daily]", 604800: "[weekly]"}  # what PeriodicAlert can describe
+
+
+def get(row: Row, key: str, default: Any = None) -> Any:
+    value = row.get(key)
+    return default if value is None or value == "" else value
+
+
+def parse_at(row: Row) -> dt:
+    if (at := get(row, "at")) is None:
+        raise ValueError("missing at")
+    res = dt.fromisoformat(str(at))
+    if res.tzinfo is not None:
+        res = res.astimezone(pytz.utc).replace(tzinfo=None)
+    return res
+
+
+def to_alert(row: Row, user: Optional[int], channel_id: Optional[int]) -> Alert:
+    """Validates a single row. `user` and `channel_id` fill in missing columns."""
+    if (user := get(row, "user", user)) is None:
+        raise ValueError("missing user")
+    if (channel := get(row, "channel", channel_id)) is None:
+        raise ValueError("missing channel")
+    user, channel = int(user), int(channel)
+    if user in banned_users:
+        raise ValueError(f"user {user} is banned")
+    if not (msg := str(get(row, "msg", "")).strip()):
+        raise ValueError("missing msg")
+    tag = str(get(row, "tag", ""))
+
+    kind = str(get(row, "kind", "single")).lower()
+    if kind == "single":
+        if (at := parse_at(row)) < now():
+            raise ValueError(f"{at} is in the past")
+        return SingleAlert(msg, user, channel, at, tag)
+    if kind == "periodic":
+        if (every := float(get(row, "every", 0))) not in periods:
+            raise ValueError("every has to be 86400 (daily) or 604800 (weekly)")
+        return PeriodicAlert(
+            msg, user, channel, timedelta(seconds=every), parse_at(row), tag
+        )
+    if kind == "monthly":
+        if not 1 <= (day := int(get(row, "day", 0))) <= 31:
+            raise ValueError("day has to be between 1 and 31")
+        time = Time.fromisoformat(str(get(row, "time", "")))
+        return MonthlyAlert(msg, user, channel, day, time, tag)
+    raise ValueError(f"unknown kind {kind!r}")
+
+
+def read_csv(f: TextIO) -> Iterator[Union[Row, ValueError]]:
+    rows = csv.DictReader(f)
+    while True:
+        try:
+            yield next(rows)
+        except StopIteration:
+            return
+        except csv.Error as e:  # the reader moves on to the next line after
+            yield ValueError(f"invalid csv: {e}")
+
+
+def read_json(f: TextIO) -> Iterator[Union[Row, ValueError]]:
+    head = f.read(1)
+    while head.isspace():
+        head = f.read(1)
+    if head == "[":
+        # the stdlib can't stream a top-level array, so that one is read whole
+        try:
+            rows = json.loads(head + f.read())
+        except json.JSONDecodeError as e:
+            yield ValueError(f"invalid json: {e.msg} at line {e.lineno}")
+            return
+        yield from rows
+        return
+    for line in itertools.chain([head + f.readline()], f):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"invalid json: {e.msg}")
+
+
+def unfold(f: TextIO) -> Iterator[str]:
+    """iCalendar wraps long lines by starting the continuation with whitespace."""
+    line: Optional[str] = None
+    for raw in f:
+        raw = raw.rstrip("\r\n")
+        if line is not None and raw[:1] in (" ", "\t"):
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+
+def ical_unescape(text: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m[1] in "nN" else m[1], text)
+
+
+def ical_escape(text: str) -> str:
+    return re.sub(r"([\\;,])", r"\\\1", text).replace("\n", "\\n")
+
+
+def ical_dt(value: str, tzid: Optional[str]) -> dt:
+    if len(value) == 8:
+        return dt.strptime(value, "%Y%m%d")
+    res = dt.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z") or tzid is None:
+        return res
+    return pytz.timezone(tzid).localize(res).astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def event_row(event: Dict[str, Tuple[Dict[str, str], str]]) -> Union[Row, ValueError]:
+    if "DTSTART" not in event:
+        return ValueError("VEVENT without DTSTART")
+    params, start = event["DTSTART"]
+    try:
+        at = ical_dt(start, params.get("TZID"))
+    except (ValueError, pytz.UnknownTimeZoneError) as e:
+        return ValueError(f"bad DTSTART {start!r}: {e}")
+    row: Row = {
+        "kind": "single",
+        "user": event.get("X-FORTMOGOS-USER", ({}, None))[1],
+        "channel": event.get("X-FORTMOGOS-CHANNEL", ({}, None))[1],
+        "msg": ical_unescape(event.get("SUMMARY", ({}, ""))[1]),
+        "at": at.isoformat(),
+        "tag": ical_unescape(event.get("X-FORTMOGOS-TAG", ({}, ""))[1]),
+    }
+    if "RRULE" not in event:
+        return row
+    rrule = dict(part.partition("=")[::2] for part in event["RRULE"][1].split(";"))
+    freq, interval = rrule.get("FREQ"), rrule.get("INTERVAL", "1")
+    if freq in ("DAILY", "WEEKLY") and interval == "1":
+        row["kind"], row["every"] = "periodic", 86400 if freq == "DAILY" else 604800
+    elif freq == "MONTHLY" and interval == "1":
+        row["kind"], row["time"] = "monthly", at.time().isoformat()
+        row["day"] = rrule.get("BYMONTHDAY", at.day)
+    else:
+        return ValueError(f"unsupported RRULE {event['RRULE'][1]!r}")
+    return row
+
+
+def read_ical(f: TextIO) -> Iterator[Union[Row, ValueError]]:
+    event: Optional[Dict[str, Tuple[Dict[str, str], str]]] = None
+    for line in unfold(f):
+        name, _, value = line.partition(":")
+        name, *params = name.split(";")
+        name = name.upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {}
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            yield event_row(event)
+            event = None
+        elif event is not None:
+            event[name] = (dict(p.partition("=")[::2] for p in params), value)
+
+
+readers: Dict[str, Callable[[TextIO], Iterator[Union[Row, ValueError]]]] = {
+    "csv": read_csv,
+    "json": read_json,
+    "ics": read_ical,
+}
+
+
+def import_alerts(
+    data: DataHandler,
+    f: TextIO,
+    fmt: str,
+    user: Optional[int] = None,
+    channel_id: Optional[int] = None,
+) -> List[Alert]:
+    """
+    Adds every alert in `f`, or none of them: invalid rows raise a
+    BulkImportException listing all of them. Valid rows are inserted together, so
+    the backend commits once and batches the inserts per table.
+    """
+    if fmt not in readers:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {list(readers)}")
+    alerts: List[Alert] = []
+    errors: List[Tuple[int, str]] = []
+    for i, row in enumerate(readers[fmt](f), 1):
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            if not isinstance(row, dict):  # e.g. a json line holding a list
+                raise ValueError(f"expected an object, got {type(row).__name__}")
+            alerts.append(to_alert(row, user, channel_id))
+        except (ValueError, TypeError) as e:
+            errors.append((i, str(e)))
+    if errors:
+        raise BulkImportException(errors)
+    data.tasks.extend(alerts)
+    return alerts
+
+
+def alert_row(alert: Alert) -> Row:
+    row: Row = {
+        "user": alert.user,
+        "channel": alert.channel_id,
+        "msg": alert.msg,
+        "tag": alert.descriptor_tag or "",
+    }
+    if isinstance(alert, SingleAlert):
+        row.update(kind="single", at=alert.activation.isoformat())
+    elif isinstance(alert, PeriodicAlert):
+        row.update(
+            kind="periodic",
+            at=alert.first_activation.isoformat(),
+            every=round(alert.periodicity.total_seconds()),
+        )
+    elif isinstance(alert, MonthlyAlert):
+        row.update(
+            kind="monthly",
+            at=alert.get_next_activation(now()).isoformat(),
+            day=alert.day,
+            time=alert.time.isoformat(),
+        )
+    return row
+
+
+def write_csv(rows: Iterable[Row], out: TextIO) -> None:
+    writer = csv.DictWriter(out, fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def write_json(rows: Iterable[Row], out: TextIO) -> None:
+    for row in rows:
+        out.write(json.dumps(row) + "\n")
+
+
+def ical_line(line: str) -> str:
+    """Folds to 75 characters per line, as the spec asks."""
+    return "\r\n ".join(line[i : i + 74] for i in range(0, max(len(line), 1), 74))
+
+
+def write_ical(rows: Iterable[Row], out: TextIO) -> None:
+    out.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//fortmogos//EN\r\n")
+    stamp = now().strftime("%Y%m%dT%H%M%SZ")
+    for i, row in enumerate(rows, 1):
+        start = dt.fromisoformat(row["at"]).strftime("%Y%m%dT%H%M%SZ")
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{row['user']}-{i}@fortmogos",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{start}",
+            f"SUMMARY:{ical_escape(row['msg'])}",
+            f"X-FORTMOGOS-USER:{row['user']}",
+            f"X-FORTMOGOS-CHANNEL:{row['channel']}",
+            f"X-FORTMOGOS-TAG:{ical_escape(row['tag'])}",
+        ]
+        if row["kind"] == "periodic":
+            freq = "DAILY" if row["every"] == 86400 else "WEEKLY"
+            lines.append(f"RRULE:FREQ={freq}")
+        elif row["kind"] == "monthly":
+            lines.append(f"RRULE:FREQ=MONTHLY;BYMONTHDAY={row['day']}")
+        lines.append("END:VEVENT")
+        out.write("".join(ical_line(line) + "\r\n" for line in lines))
+    out.write("END:VCALENDAR\r\n")
+
+
+writers: Dict[str, Callable[[Iterable[Row], TextIO], None]] = {
+    "csv": write_csv,
+    "json": write_json,
+    "ics": write_ical,
+}
+
+
+def export_alerts(
+    data: DataHandler,
+    out: TextIO,
+    fmt: str,
+    user: Optional[int] = None,
+    channel_id: Optional[int] = None,
+) -> None:
+    """Writes the alerts of `user` and/or `channel_id` (default all) row by row."""
+    if fmt not in writers:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {list(writers)}")
+    writers[fmt](
+        (
+            alert_row(task)
+            for task in data.tasks.snapshot()
+            if isinstance(task, Alert)
+            and (user is None or task.user == user)
+            and (channel_id is None or task.channel_id == channel_id)
+        ),
+        out,
+    )
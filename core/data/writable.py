@@ -4,7 +4,7 @@ from abc import abstractmethod
 from datetime import datetime as dt, timedelta, time as Time
 from decimal import Decimal
 from math import ceil
-from typing import Any, Dict, cast
+from typing import Any, Dict, Optional, cast
 
 import pytz
 from core.timer import now
@@ -16,7 +16,7 @@ from core.utils.time import (
 )
 from core.utils.constants import client, todo_emoji
 from sqlalchemy import Boolean, Column, Float, Integer, String
-from sqlalchemy.orm import reconstructor  # type: ignore
+from sqlalchemy.orm import Mapped, mapped_column, reconstructor  # type: ignore
 from core.data.base import Base
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 from dateutil.relativedelta import relativedelta as rd
@@ -63,22 +63,29 @@ class Task(Immutable):
     __abstract__ = True
 
     __id = Column(Integer, primary_key=True, autoincrement=True)
+    _next_activation: Mapped[Optional[float]] = mapped_column(Float(40), index=True)
 
-    def __init__(self) -> None:
-        super(Task, self).__init__()
-        self._activation_threshold = timedelta(seconds=30)
-        self.repeatable = False
+    # constants live on the class, so each of the many loaded tasks doesn't hold copies
+    _activation_threshold = timedelta(seconds=30)
+    repeatable = False
 
     @reconstructor  # type: ignore
     def init_on_load(self) -> None:
-        self._activation_threshold = timedelta(seconds=30)
-        self.repeatable = False
+        ...
 
     async def maybe_activate(self, curr_time: dt) -> bool:
         if activated := self.should_activate(curr_time):
             await self.activate()
+            # activations can be up to half a second early, so skip past this one
+            self.update_next_activation(curr_time + timedelta(seconds=1))
         return activated
 
+    def update_next_activation(self, curr_time: dt) -> None:
+        """
+        Persists the next activation, so the db can be range queried for due tasks.
+        """
+        self._next_activation = self.get_next_activation(curr_time).timestamp()
+
     @abstractmethod
     def should_activate(self, curr_time: dt) -> bool:
         ...
@@ -104,18 +111,9 @@ class RepeatableTask(Task):
 
     __abstract__ = True
 
-    def __init__(self) -> None:
-        super(RepeatableTask, self).__init__()
-        self._repeat_activation_threshold = timedelta(seconds=60)
-        self._last_activated = now() - timedelta(days=100)
-        object.__setattr__(self, "repeatable", True)
-
-    @reconstructor  # type: ignore
-    def init_on_load(self) -> None:
-        super().init_on_load()
-        self._repeat_activation_threshold = timedelta(seconds=60)
-        self._last_activated = now() - timedelta(days=100)
-        object.__setattr__(self, "repeatable", True)
+    _repeat_activation_threshold = timedelta(seconds=60)
+    _last_activated = dt.min  # set on the instance once it goes off
+    repeatable = True
 
     async def maybe_activate(self, curr_time: dt) -> bool:
         if activated := await Task.maybe_activate(self, curr_time):
@@ -150,6 +148,7 @@ class PeriodicTask(RepeatableTask):
         self._periodicity = cast(Decimal, periodicity.total_seconds())
         self.first_activation = first_activation
         self._first_activation = cast(Decimal, first_activation.timestamp())
+        self.update_next_activation(now())
 
     @reconstructor  # type: ignore
     def init_on_load(self) -> None:
@@ -195,6 +194,7 @@ class MonthlyTask(RepeatableTask):
                 seconds=time_of_day.second,
             ).total_seconds(),
         )
+        self.update_next_activation(now())
 
     @reconstructor  # type: ignore
     def init_on_load(self) -> None:
@@ -225,6 +225,7 @@ class SingleTask(Task):
         super(SingleTask, self).__init__()
         self.activation = activation
         self._activation = activation.timestamp()  # type: ignore
+        self.update_next_activation(activation)
 
     @reconstructor  # type: ignore
     def init_on_load(self) -> None:
@@ -288,7 +289,7 @@ class Alert(Task):
         try:
             res = await client.get_partial_messageable(self.channel_id).send(msg)
             await res.add_reaction(todo_emoji)
-            data.reminder_msgs[cast(int, self.user), res.content] = self  # type: ignore
+            data.reminder_msgs.add(res.id, cast(int, self.user), cast(str, self.msg))
         except Exception:
             ...
 
@@ -435,6 +436,25 @@ class Timezone(Base):  # type: ignore
         self.tz = pytz.timezone(self._tz)
 
 
+class ReminderMessage(Base):  # type: ignore
+    """
+    A delivered alert, so reactions to it can still be routed after a restart.
+    """
+
+    __tablename__ = "reminder_message"
+
+    _id: Mapped[int] = mapped_column(Integer, primary_key=True)  # discord message id
+    user: Mapped[int] = mapped_column(Integer, nullable=True)
+    msg: Mapped[str] = mapped_column(String, nullable=True)
+    _sent: Mapped[float] = mapped_column(Float(40), nullable=True)
+
+    def __init__(self, message_id: int, user: int, msg: str, sent: dt) -> None:
+        self._id = message_id
+        self.user = user
+        self.msg = msg
+        self._sent = sent.timestamp()
+
+
 class UserTask(Base):  # type: ignore
     """
     A self-described user task. Appears in todo list.
@@ -474,6 +494,7 @@ class Wakeup(RepeatableTask, Base):  # type: ignore
         self._time = wakeup_time.hour * 3600 + wakeup_time.minute * 60
         self.channel = channel
         self.disabled = disabled
+        self.update_next_activation(now())
 
     @reconstructor  # type: ignore
     def init_on_load(self) -> None:
@@ -13,7 +13,7 @@ timer = Timer(data)
 
 
 async def get_awaitables():
-    return await asyncio.gather(start_discord(), timer.run())
+    return await asyncio.gather(start_discord(), timer.run(), data.migrate())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import timedelta
+from typing import Tuple
+
+from core.admin import main
+from core.data.backend import SQLiteBackend
+from core.data.writable import SingleAlert, Timezone
+from core.timer import now
+from disc.tests.main import Test
+
+
+def admin(*argv: str) -> Tuple[int, str]:
+    out = io.StringIO()
+    with redirect_stdout(out):
+        code = main(argv)
+    return code, out.getvalue()
+
+
+class TestAdmin(Test):
+    async def test_admin(self) -> None:
+        path = os.path.join(tempfile.mkdtemp(), "data.db")
+        backend = SQLiteBackend(path)
+        backend.add(Timezone(1, "US/Eastern"))
+        for user in (1, 2, 2):
+            backend.add(SingleAlert("x", user, 0, now() + timedelta(hours=1)))
+        backend.commit()
+        backend.session.close()
+        backend.engine.dispose()
+
+        code, out = admin("--db", path, "top")
+        self.assert_equal(
+            [line.split() for line in out.splitlines()], [["2", "2"], ["1", "1"]]
+        )
+
+        code, out = admin("--db", path, "check")
+        self.assert_equal(code, 1)
+        self.assert_true("users with alerts but no timezone: (2,)" in out)
+
+        self.assert_equal(admin("--db", path, "purge", "2", "--yes")[0], 0)
+        self.assert_equal(admin("--db", path, "check"), (0, "ok\n"))
+        code, out = admin("--db", path, "due")
+        self.assert_equal(out.split()[-2:], ["1", "#"])
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from typing import cast
+from unittest.mock import patch
+
+from core.data.writable import PeriodicAlert, SingleAlert
+from core.start import data
+from core.timer import Schedule, Timer, now
+from core.utils.constants import testmogus_id
+from disc.tests.main import Test
+from disc.tests.utils import user_says
+
+
+class TestTimer(Test):
+    async def test_schedule_due(self) -> None:
+        curr_time = now()
+        later = SingleAlert("later", testmogus_id, 0, curr_time + timedelta(hours=2))
+        soon = SingleAlert("soon", testmogus_id, 0, curr_time + timedelta(hours=1))
+
+        schedule = Schedule()
+        schedule.rebuild([later, soon], (0, 0))
+        self.assert_equal(schedule.due(curr_time), [])
+        self.assert_equal(schedule.due(curr_time + timedelta(hours=1)), [soon])
+        self.assert_equal(schedule.due(curr_time + timedelta(hours=3)), [soon, later])
+
+    async def test_schedule_reschedule(self) -> None:
+        curr_time = now()
+        later = SingleAlert("later", testmogus_id, 0, curr_time + timedelta(hours=2))
+        soon = PeriodicAlert(
+            "soon", testmogus_id, 0, timedelta(days=1), curr_time + timedelta(hours=1)
+        )
+
+        schedule = Schedule()
+        schedule.rebuild([later, soon], (0, 0))
+        soon.update_next_activation(curr_time + timedelta(hours=1, seconds=1))
+        schedule.reschedule(1, [soon])
+        self.assert_equal(schedule.due(curr_time + timedelta(hours=2)), [later])
+        self.assert_equal(schedule.due(curr_time + timedelta(days=2)), [later, soon])
+
+    async def test_tick_keeps_schedule(self) -> None:
+        await user_says("daily 8am wake up")
+        alert = cast(PeriodicAlert, data.tasks[0])
+        first = alert.first_activation
+        timer = Timer(data)
+        with patch.object(
+            Schedule, "window", timedelta(days=7).total_seconds()
+        ), patch.object(
+            timer.schedule, "rebuild", wraps=timer.schedule.rebuild
+        ) as rebuild:
+            for day in range(3):
+                timer.timer = first + timedelta(days=day)
+                await timer.tick()
+        # fired every day, and moved in place rather than rebuilding the schedule
+        self.assert_equal(
+            alert._next_activation, (first + timedelta(days=3)).timestamp()
+        )
+        self.assert_equal(rebuild.call_count, 1)
+        self.assert_true(any(task is alert for task in timer.schedule.tasks))
+
+    async def test_tick_pages_in(self) -> None:
+        await user_says("in 2 hours wake up")
+        alert = data.tasks[0]
+        timer = Timer(data)
+        timer.timer = now()
+        await timer.tick()
+        # only the next hour is paged in from the db
+        self.assert_equal(timer.schedule.tasks, [])
+        timer.timer += timedelta(hours=1, minutes=30)
+        await timer.tick()
+        self.assert_equal(timer.schedule.tasks, [alert])
+
+    async def test_tick_drops_missed(self) -> None:
+        await user_says("in 2 minutes wake up")
+        alert = data.tasks[0]
+        timer = Timer(data)
+        timer.timer = now() + timedelta(minutes=5)
+        with patch.object(data, "commit", wraps=data.commit) as commit:
+            for _ in range(3):
+                await timer.tick()
+        # too late to send, so it's dropped once instead of checked every tick
+        self.assert_true(not any(task is alert for task in data.tasks))
+        self.assert_equal(timer.schedule.tasks, [])
+        self.assert_equal(commit.call_count, 0)
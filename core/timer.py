@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+from array import array
+from bisect import bisect_right
 from datetime import datetime as dt, timedelta
-from typing import TYPE_CHECKING
+from math import inf
+from typing import TYPE_CHECKING, Iterable, List, Optional, Set, Tuple, cast
 
 import pytz
 
@@ -38,10 +41,66 @@ class Now:
 now = Now()  # callable that returns UTC time, no timezone attached
 
 
+class Schedule:
+    """
+    The Timer's working set: next activation epochs in a sorted array, with the tasks
+    they belong to in a parallel list. A tick bisects for the due prefix instead of
+    doing datetime math on every task, and only due tasks are touched. It holds
+    every task due before `horizon`; the Timer pages in the next `window` seconds of
+    tasks from the db's `_next_activation` index once time gets there.
+    """
+
+    # periodic tasks may go off half a second early, see PeriodicTask
+    early = 0.5
+    window = 3600.0
+
+    def __init__(self) -> None:
+        self.epochs = array("d")
+        self.tasks: List[Task] = []
+        self.versions: Optional[Tuple[int, ...]] = None
+        self.horizon = 0.0
+
+    def rebuild(
+        self, tasks: Iterable[Task], versions: Tuple[int, ...], horizon: float = inf
+    ) -> None:
+        entries = sorted(
+            (
+                (task._next_activation, i, task)
+                for i, task in enumerate(tasks)
+                if task._next_activation is not None
+            ),
+            key=lambda entry: entry[:2],
+        )
+        self.epochs = array("d", (epoch for epoch, _, _ in entries))
+        self.tasks = [task for _, _, task in entries]
+        self.versions = versions
+        self.horizon = horizon
+
+    def paged_out(self, curr_time: dt) -> bool:
+        """Whether tasks past `horizon` could be due by `curr_time`."""
+        return curr_time.timestamp() + Schedule.early >= self.horizon
+
+    def due(self, curr_time: dt) -> List[Task]:
+        return self.tasks[
+            : bisect_right(self.epochs, curr_time.timestamp() + Schedule.early)
+        ]
+
+    def reschedule(self, n: int, tasks: Iterable[Task]) -> None:
+        """Drops the first `n` entries, and puts `tasks` back at their new epochs."""
+        del self.epochs[:n]
+        del self.tasks[:n]
+        for task in tasks:
+            if (epoch := task._next_activation) is not None:
+                i = bisect_right(self.epochs, epoch)
+                self.epochs.insert(i, epoch)
+                self.tasks.insert(i, task)
+
+
 class Timer:
     def __init__(self, data: "DataHandler"):
         self.timer = now()
         self.data = data
+        self.schedule = Schedule()
 
     async def run(self):
         while not hasattr(self.data, "wakeup"):
@@ -50,16 +109,55 @@ class Timer:
         while "among":
             print(f"It's currently {' '.join(str(now()).split(' ')[1:])}")
 
-            async def should_keep_task(task: Task) -> bool:
-                return not await task.maybe_activate(self.timer) or task.repeatable
-
-            async def maybe_activate(_: int, task: Task) -> None:
-                await task.maybe_activate(self.timer)
-
-            await self.data.tasks.async_filter(should_keep_task)
-            await self.data.wakeup.async_lambda(maybe_activate)
+            await self.tick()
+            self.data.maybe_snapshot()
+            self.data.maintain_history()
 
             await asyncio.sleep(
                 min(0.01, max(0, 0.01 - (now() - self.timer).total_seconds()))
             )
             self.timer = now()
+
+    async def tick(self) -> None:
+        versions = (self.data.tasks.version, self.data.wakeup.version)
+        if versions != self.schedule.versions or self.schedule.paged_out(self.timer):
+            horizon = self.timer + timedelta(seconds=Schedule.window)
+            self.schedule.rebuild(
+                self.data.due_tasks(None, horizon), versions, horizon.timestamp()
+            )
+
+        # the due list is a copy, so commands can change tasks while we await sends
+        changed = False
+        due = self.schedule.due(self.timer)
+        done: Set[int] = set()  # ids of tasks that won't go off again
+        discarded = 0
+        for task in due:
+            scheduled = cast(float, task._next_activation)
+            if await task.maybe_activate(self.timer):
+                if self.data.history is not None:
+                    self.data.history.record(task, scheduled, self.timer)
+                if not task.repeatable:
+                    done.add(id(task))
+                    discarded += self.data.tasks.discard(task)
+                changed = True
+            elif (
+                self.timer.timestamp() - scheduled
+                > task._activation_threshold.total_seconds()
+            ):  # missed, e.g. we were down
+                if task.repeatable:  # catch up to the next one
+                    task.update_next_activation(self.timer)
+                    changed = True
+                else:  # there is no next one, and it's too late to send
+                    done.add(id(task))
+                    discarded += self.data.tasks.discard(task)
+
+        if changed:
+            self.data.commit()
+        self.schedule.reschedule(
+            len(due), (task for task in due if id(task) not in done)
+        )
+        # only the due tasks moved, so the schedule is up to date unless a
+        # command changed the tasks meanwhile, in which case it's rebuilt next tick
+        expected = versions[0] + discarded, versions[1]
+        if (self.data.tasks.version, self.data.wakeup.version) == expected:
+            self.schedule.versions = expected
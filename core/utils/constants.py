@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 import discord
 
 
@@ -22,6 +23,24 @@ client = discord.Client(intents=discord.Intents.all())
 
 banned_users = {442721077408563200}
 
+# any SQLAlchemy url, e.g. postgresql://user:pw@host/fortmogos; None uses data.db
+db_url: Optional[str] = None
+
+# keep delivered alerts in the db so reactions to them work across restarts
+persist_reminder_msgs = True
+
+# directory for the DataHandler snapshot + journal; None loads everything from the db
+snapshot_dir: Optional[str] = None
+
+# split the db by user into this many sqlite files under shard_dir; None keeps one db.
+# The activation history isn't per user and goes to shard_dir/directory.db. Fast
+# restart (snapshot_dir) only works with a single db.
+shards: Optional[int] = None
+shard_dir = "shards"
+
+# log every activation and keep per-minute/per-hour rollups of them
+record_history = True
+
 
 class Separator:
     """
@@ -1,6 +1,24 @@
+from typing import List, Tuple
+
+
 class MissingTimezoneException(Exception):
     help = (
         "Please report your timezone first! Report one of the following: "
         "the current time in your area `timezone 4:20PM`; the offset "
         "`timezone UTC+5`; the region name `timezone US/Eastern`."
     )
+
+
+class BulkImportException(Exception):
+    """Raised with every invalid row of an import; nothing is imported."""
+
+    def __init__(self, errors: List[Tuple[int, str]]) -> None:
+        super().__init__(
+            "\n".join(f"row {row}: {error}" for row, error in errors[:20])
+            + (f"\n...and {len(errors) - 20} more" if len(errors) > 20 else "")
+        )
+        self.errors = errors
+
+
+class ChangeStreamLagged(Exception):
+    """The subscriber fell behind and missed changes; rebuild from a snapshot."""
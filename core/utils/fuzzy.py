@@ -0,0 +1,73 @@
+"""
+Typo lookups against a fixed vocabulary, SymSpell-style: each word is indexed under
+every string left after deleting up to `max_distance` of its characters. Two words
+that many edits apart share one of those strings, so candidates come from a few hash
+lookups and only they are compared character by character.
+"""
+
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations
+from typing import DefaultDict, FrozenSet, List, Optional, Set
+
+
+def distance(x: str, y: str) -> int:
+    """Edits turning `x` into `y`, where swapping two neighbours counts as one."""
+    before: List[int] = []
+    prev = list(range(len(y) + 1))
+    for i in range(1, len(x) + 1):
+        curr = [i] + [0] * len(y)
+        for j in range(1, len(y) + 1):
+            curr[j] = min(
+                prev[j] + 1, curr[j - 1] + 1, prev[j - 1] + (x[i - 1] != y[j - 1])
+            )
+            if i > 1 and j > 1 and x[i - 1] == y[j - 2] and x[i - 2] == y[j - 1]:
+                curr[j] = min(curr[j], before[j - 2] + 1)
+        before, prev = prev, curr
+    return prev[-1]
+
+
+def deletes(word: str, n: int) -> Set[str]:
+    """`word` with up to `n` of its characters removed, including `word` itself."""
+    return {
+        "".join(kept)
+        for size in range(max(len(word) - n, 0), len(word) + 1)
+        for kept in combinations(word, size)
+    }
+
+
+class FuzzyIndex:
+    def __init__(self, max_distance: int = 2, long_word: int = 7) -> None:
+        self.max_distance = max_distance
+        self.long_word = long_word
+        self.words: Set[str] = set()
+        self.index: DefaultDict[str, Set[str]] = defaultdict(set)
+
+    def add(self, word: str) -> None:
+        if word in self.words:
+            return
+        self.words.add(word)
+        for key in deletes(word, self.max_distance):
+            self.index[key].add(word)
+        self.near.cache_clear()
+
+    def candidates(self, word: str, n: int) -> Set[str]:
+        """A superset of the known words within `n` edits of `word`."""
+        return {match for key in deletes(word, n) for match in self.index.get(key, ())}
+
+    @lru_cache(maxsize=4096)
+    def near(self, word: str) -> FrozenSet[str]:
+        """
+        The known words `word` may be a typo of: one edit away, or two if it has at
+        least `long_word` characters, as two edits leave too little of a short word.
+        """
+        return frozenset(self.suggest(word, 2 if len(word) >= self.long_word else 1))
+
+    def suggest(self, word: str, max_distance: Optional[int] = None) -> List[str]:
+        """Known words other than `word` within `max_distance` edits, closest first."""
+        n = self.max_distance if max_distance is None else max_distance
+        n = min(n, self.max_distance)
+        ranked = sorted(
+            (distance(word, match), match) for match in self.candidates(word, n)
+        )
+        return [match for d, match in ranked if 0 < d <= n]
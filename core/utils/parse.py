@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from collections import deque
+from collections import OrderedDict, defaultdict
+from copy import copy
+from functools import cached_property
 from datetime import datetime as dt
 from datetime import time as Time
 from itertools import chain, product
@@ -9,11 +11,15 @@ from typing import (
     Any,
     Callable,
     Coroutine,
-    Deque,
+    DefaultDict,
+    Dict,
     Generic,
+    Hashable,
     List,
+    NamedTuple,
     Optional,
     Sequence,
+    Set,
     Tuple,
     TypeVar,
     cast,
@@ -28,7 +34,9 @@ from typing_extensions import TypeVarTuple, Unpack
 from core.context import Context
 from core.data.handler import DataHandler
 from core.timer import now
-from core.utils.time import parse_duration, replace_down
+from core.utils.color import green
+from core.utils.fuzzy import FuzzyIndex
+from core.utils.time import DurationParser, OffsetIndex, replace_down
 
 ARGS = TypeVarTuple("ARGS")
 T = TypeVar("T")
@@ -38,24 +46,91 @@ T3 = TypeVar("T3")
 RES = Coroutine[Any, Any, None]
 
 
-def edit_distance_one(x: str, y: str) -> bool:
-    if x == y:
-        return False
-    if len(x) == len(y) and sum(1 for c1, c2 in zip(x, y) if c1 != c2) == 1:
-        return True
-    if len(x) > len(y):
-        x, y = y, x
-    if len(x) + 1 == len(y):
-        diff = 0
-        while diff < len(x) and x[diff] == y[diff]:
-            diff += 1
-        if x[diff:] == y[diff + 1 :]:
-            return True
-    if len(x) == len(y):
-        for i in range(len(x) - 1):
-            if x[:i] + x[i + 1] + x[i] + x[i + 2 :] == y:
-                return True
-    return False
+keywords = FuzzyIndex()  # every word a Literal or _SingleLiteral expects
+
+weekdays = frozenset(
+    ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+)
+ordinal_suffixes = ("st", "nd", "rd", "th")
+
+
+class TokenKind:
+    NUMBER = 0  # 12
+    ORDINAL = 1  # 3rd
+    CLOCK = 2  # 4pm, 4:20pm, 4:20
+    AM_PM = 3  # am, pm
+    DURATION = 4  # 5m, 1h30m
+    DATE = 5  # 9/12, 9/12/2024
+    WEEKDAY = 6  # monday
+    WORD = 7  # anything else; never starts with a digit
+
+
+class Token(NamedTuple):
+    text: str
+    lower: str
+    kind: int
+
+
+Tokens = Tuple[Token, ...]
+Matcher = Callable[["Cursor"], Any]
+Memo = Dict[Tuple[Hashable, int], Tuple[Any, int]]
+Stamp = Tuple[int, "Expr", int, int, bool]  # arg, expr, start, end, whether it matched
+
+
+class Cursor:
+    """
+    A position in a message's tokens, read like a deque. Nothing is copied when
+    trying alternatives: backtracking is resetting `pos`. `memo` holds what compiled
+    exprs matched where, for every command parsing the same message.
+    """
+
+    __slots__ = ("tokens", "pos", "memo")
+
+    def __init__(
+        self, tokens: Tokens, pos: int = 0, memo: Optional[Memo] = None
+    ) -> None:
+        self.tokens = tokens
+        self.pos = pos
+        self.memo: Memo = {} if memo is None else memo
+
+    def __len__(self) -> int:
+        return len(self.tokens) - self.pos
+
+    def __getitem__(self, i: int) -> Token:
+        return self.tokens[self.pos + i]
+
+    def popleft(self) -> Token:
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+
+def classify(text: str, lower: str) -> int:
+    if text.isnumeric():
+        return TokenKind.NUMBER
+    if lower in ("am", "pm"):
+        return TokenKind.AM_PM
+    if lower in weekdays:
+        return TokenKind.WEEKDAY
+    if "/" in text:
+        return TokenKind.DATE
+    if len(text) >= 3 and text[:-2].isnumeric() and text[-2:] in ordinal_suffixes:
+        return TokenKind.ORDINAL
+    if text.lstrip(":")[:1].isnumeric():
+        if ":" in text or lower[-2:] in ("am", "pm"):
+            return TokenKind.CLOCK
+        return TokenKind.DURATION
+    return TokenKind.WORD
+
+
+def lex(msg: str) -> Tokens:
+    """Splits and classifies a message once, for every command to share."""
+    while "  " in msg:
+        msg = msg.replace("  ", " ")
+    return tuple(
+        Token(text, lower, classify(text, lower))
+        for text in msg.split(" ")
+        for lower in (text.lower(),)
+    )
 
 
 def almost_number(x: str) -> bool:
@@ -73,11 +148,45 @@ def res_key(res: List[Warn] | Tuple[Any, ...] | None) -> Tuple[float, int]:
     )
 
 
+def memoized(key: Hashable, f: Matcher) -> Matcher:
+    def match(x: Cursor) -> Any:
+        if (hit := x.memo.get((key, start := x.pos))) is not None:
+            res, x.pos = hit
+            return res
+        res = f(x)
+        x.memo[key, start] = res, x.pos
+        return res
+
+    return match
+
+
 class Expr(ABC):
+    memoize = True  # False for exprs cheaper to rerun than to look up
+    time_relative = False  # True for exprs whose result depends on now()
+
     @abstractmethod
-    def match(self, x: Deque[str]) -> Tuple[Any, ...] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[Any, ...] | List[Warn] | None:
         ...
 
+    def memo_key(self) -> Hashable:
+        """Equal for exprs that always match the same way, e.g. any two TimeExprs."""
+        return type(self)
+
+    def compile(self) -> Matcher:
+        """
+        A function matching exactly like `match`. Exprs built on an ExprGroup run a
+        copy of themselves on the group's compiled form. Results are memoized per
+        position while parsing a message, so the alternatives of a group, or other
+        commands, get a sub-expr they already tried at that spot for free.
+        """
+        if (group := getattr(self, "expr_group", None)) is None:
+            f = self.match
+        else:
+            compiled = copy(self)
+            setattr(compiled, "expr_group", group.compile())
+            f = compiled.match
+        return memoized(self.memo_key(), f) if self.memoize else f
+
 
 class Chain(Generic[Unpack[ARGS]]):
     exprs: List[Expr]
@@ -164,11 +273,58 @@ class Command(Generic[Unpack[ARGS]]):
         self.exprs = exprs
         self.f = f
         self.needs_tz = needs_tz
+        self.time_relative = any(expr.time_relative for expr in exprs)
+        self.matcher: Optional[Matcher] = None
+        self.matchers: List[Matcher] = []
+
+    def compile(self) -> Matcher:
+        """Builds, once, the function `parse` runs: `interpret` with exprs inlined."""
+        if self.matcher is not None:
+            return self.matcher
+        self.matchers = matchers = [expr.compile() for expr in self.exprs]
+
+        def match(x: Cursor) -> Tuple[Any, ...] | List[Warn] | None:
+            args: Tuple[Any, ...] = ()
+            for f in matchers:
+                if x.pos == len(x.tokens):
+                    return [Warn("Ran out of tokens while parsing.")]
+                if not isinstance(res := f(x), tuple):
+                    return None
+                args += res
+            return [Warn("Unexpected tokens after parsing.")] if x else args
+
+        self.matcher = match
+        return match
+
+    def parse(self, msg: str | Tokens, memo: Optional[Memo] = None) -> ParsedCommand:
+        res = self.compile()(Cursor(lex(msg) if isinstance(msg, str) else msg, 0, memo))
+        return ParsedCommand(self.f, self.needs_tz, res)
+
+    def stamps(self, tokens: Tokens, memo: Memo) -> List[Stamp]:
+        """
+        Each time relative expr this command got to parsing `tokens`: the index of its
+        arg, where it started and ended and whether it matched. As long as these still
+        match the same, so does the command. Everything is in `memo` already.
+        """
+        self.compile()
+        x = Cursor(tokens, 0, memo)
+        stamps: List[Stamp] = []
+        arg = 0
+        for expr, f in zip(self.exprs, self.matchers):
+            if x.pos == len(tokens):
+                break
+            start = x.pos
+            matched = isinstance(res := f(x), tuple)
+            if expr.time_relative:
+                stamps.append((arg, expr, start, x.pos, matched))
+            if not matched:
+                break
+            arg += len(res)
+        return stamps
 
-    def parse(self, msg: str) -> ParsedCommand:
-        while "  " in msg:
-            msg = msg.replace("  ", " ")
-        dq = deque(msg.split(" "))
+    def interpret(self, msg: str | Tokens) -> ParsedCommand:
+        """Walks the exprs one by one; the reference the compiled `parse` follows."""
+        dq = Cursor(lex(msg) if isinstance(msg, str) else msg)
         args: List[Any] = []
         warnings: List[Warn] = []
         for expr in self.exprs:
@@ -215,7 +371,7 @@ class Expr0(Expr, Chain[()]):
         self.exprs: List[Expr] = [self]
 
     @abstractmethod
-    def match(self, x: Deque[str]) -> Tuple[()] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[()] | List[Warn] | None:
         ...
 
 
@@ -225,7 +381,7 @@ class Expr1(Chain[T1], Expr):
         self.exprs: List[Expr] = [self]
 
     @abstractmethod
-    def match(self, x: Deque[str]) -> Tuple[T1] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[T1] | List[Warn] | None:
         ...
 
 
@@ -235,7 +391,7 @@ class Expr2(Chain[T1, T2], Expr):
         self.exprs: List[Expr] = [self]
 
     @abstractmethod
-    def match(self, x: Deque[str]) -> Tuple[T1, T2] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[T1, T2] | List[Warn] | None:
         ...
 
 
@@ -245,7 +401,7 @@ class Expr3(Chain[T1, T2, T3], Expr):
         self.exprs: List[Expr] = [self]
 
     @abstractmethod
-    def match(self, x: Deque[str]) -> Tuple[T1, T2, T3] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[T1, T2, T3] | List[Warn] | None:
         ...
 
 
@@ -264,26 +420,70 @@ class ExprGroup(Generic[T]):
         self.expr_options = expr_options
         self.metadata = metadata
 
-    def match(self, x: Deque[str]) -> Tuple[Tuple[Any, ...] | List[Warn] | None, T]:
+    def match(self, x: Cursor) -> Tuple[Tuple[Any, ...] | List[Warn] | None, T]:
         """
-        Try all options out, pick best.
+        Try all options out, pick best: the first of those with the best result that
+        consume the most tokens.
         """
-        best, dq_pop, best_metadata = min(
-            (
-                (self.match_option(option, xc := deque(x)), len(x) - len(xc), metadata)
-                for option, metadata in zip(
-                    self.expr_options,
-                    self.metadata or [cast(T, None)] * len(self.expr_options),
-                )
-            ),
-            key=lambda r: (res_key(r[0]), len(xc) - len(x)),
-        )
-        for _ in range(dq_pop):
-            x.popleft()
+        start = x.pos
+        best_key: Tuple[Tuple[float, int], int] = ((4, 0), 0)
+        best, best_end, best_metadata = None, start, cast(T, None)
+        for option, metadata in zip(
+            self.expr_options,
+            self.metadata or [cast(T, None)] * len(self.expr_options),
+        ):
+            x.pos = start
+            res = self.match_option(option, x)
+            if (key := (res_key(res), start - x.pos)) < best_key:
+                best_key, best, best_end, best_metadata = key, res, x.pos, metadata
+                if key[0] == (0, 0) and not x:  # nothing can beat matching it all
+                    break
+        x.pos = best_end
         return best, best_metadata
 
+    def compile(self) -> CompiledGroup[T]:
+        """`match`, with `match_option` inlined and every option's exprs compiled."""
+        options = [
+            ([expr.compile() for expr in option], metadata)
+            for option, metadata in zip(
+                self.expr_options,
+                self.metadata or [cast(T, None)] * len(self.expr_options),
+            )
+        ]
+
+        def match(x: Cursor) -> Tuple[Tuple[Any, ...] | List[Warn] | None, T]:
+            start, end = x.pos, len(x.tokens)
+            best_key: Tuple[Tuple[float, int], int] = ((4, 0), 0)
+            best, best_end, best_metadata = None, start, cast(T, None)
+            for matchers, metadata in options:
+                x.pos = start
+                args: Tuple[Any, ...] = ()
+                warnings: List[Warn] = []
+                res: Tuple[Any, ...] | List[Warn] | None
+                for f in matchers:
+                    if x.pos == end:
+                        res = [Warn("Ran out of tokens while parsing.")]
+                        break
+                    if (curr := f(x)) is None:
+                        res = None
+                        break
+                    if isinstance(curr, list):
+                        warnings += curr
+                    else:
+                        args += curr
+                else:
+                    res = warnings or args
+                if (key := (res_key(res), start - x.pos)) < best_key:
+                    best_key, best, best_end, best_metadata = key, res, x.pos, metadata
+                    if key[0] == (0, 0) and x.pos == end:
+                        break
+            x.pos = best_end
+            return best, best_metadata
+
+        return CompiledGroup(match)
+
     def match_option(
-        self, option: List[Expr], x: Deque[str]
+        self, option: List[Expr], x: Cursor
     ) -> Tuple[Any, ...] | List[Warn] | None:
         """Try matching on an option of exprs"""
         res: Tuple[Any, ...] = ()
@@ -301,25 +501,58 @@ class ExprGroup(Generic[T]):
         return warnings or res
 
 
+class CompiledGroup(Generic[T]):
+    def __init__(
+        self, match: Callable[[Cursor], Tuple[Tuple[Any, ...] | List[Warn] | None, T]]
+    ) -> None:
+        self.match = match
+
+
 class _SingleLiteral(Expr0):
+    memoize = False
+
     def __init__(self, word: str) -> None:
         super().__init__()
         self.word = word
+        keywords.add(word)
 
-    def match(self, x: Deque[str]) -> Tuple[()] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[()] | List[Warn] | None:
         """Matches a single word from expected/actual strings."""
         if not len(x):
             return [Warn("Ran out of tokens while parsing.")]
-        if edit_distance_one(actual := x[0].lower(), self.word):
+        if self.word in keywords.near(actual := x[0].lower):
             x.popleft()
             return [Warn(f"Did you mean `{self.word}` instead of `{actual}`?")]
         return () if actual == self.word and x.popleft() else None
 
+    def compile(self) -> Matcher:
+        word = self.word
+
+        def match(x: Cursor) -> Tuple[()] | List[Warn] | None:
+            if x.pos == len(x.tokens):
+                return [Warn("Ran out of tokens while parsing.")]
+            if (actual := x.tokens[x.pos].lower) == word:
+                x.pos += 1
+                return ()
+            if word in keywords.near(actual):
+                x.pos += 1
+                return [Warn(f"Did you mean `{word}` instead of `{actual}`?")]
+            return None
+
+        return match
+
     def __repr__(self) -> str:
         return f"_SingleLiteral({self.word})"
 
 
 class Literal(Expr0):
+    """
+    Matches one phrase per chunk, e.g. Literal(SHOW, TASKS) takes "see todos". Words
+    are checked against a frozenset of the ones possible at each point, with phrases
+    of several words walked as a small automaton, so the cost doesn't grow with the
+    number of synonyms. Only a typo or running out of tokens tries every option.
+    """
+
     def __init__(self, *_val: str | Sequence[str]) -> None:
         super().__init__()
         val: List[List[str]] = [
@@ -327,69 +560,130 @@ class Literal(Expr0):
             for chunk in _val
         ]
         strd_options = [list(choice) for choice in product(*val)]
-        self.expr_group = ExprGroup[None](
+        self.options = [
+            [word for phrase in option for word in phrase.split(" ")]
+            for option in strd_options
+        ]
+        # per chunk: its one word phrases, and the longer ones
+        self.chunks: List[Tuple[frozenset[str], List[Tuple[str, ...]]]] = []
+        for chunk in val:
+            phrases = [tuple(phrase.split(" ")) for phrase in chunk]
+            self.chunks.append(
+                (
+                    frozenset(words[0] for words in phrases if len(words) == 1),
+                    [words for words in phrases if len(words) > 1],
+                )
+            )
+        self.first_words = frozenset(option[0] for option in self.options if option)
+        for option in self.options:
+            for word in option:
+                keywords.add(word)
+
+    @cached_property
+    def expr_group(self) -> ExprGroup[None]:
+        return ExprGroup[None](
             expr_options=[
-                [
-                    _SingleLiteral(word)
-                    for phrase in option
-                    for word in phrase.split(" ")
-                ]
-                for option in strd_options
+                [_SingleLiteral(word) for word in option] for option in self.options
             ]
         )
 
-    def match(self, x: Deque[str]) -> Tuple[()] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[()] | List[Warn] | None:
         return cast(Tuple[()] | List[Warn] | None, self.expr_group.match(x)[0])
 
+    def longest(self, tokens: Tokens, start: int) -> Optional[int]:
+        """Where the longest exactly matching option starting at `start` ends."""
+        ends = {start}
+        for words, phrases in self.chunks:
+            ends = {
+                end + len(phrase)
+                for end in ends
+                for phrase in phrases
+                if tuple(token.lower for token in tokens[end : end + len(phrase)])
+                == phrase
+            } | {
+                end + 1
+                for end in ends
+                if end < len(tokens) and tokens[end].lower in words
+            }
+            if not ends:
+                return None
+        return max(ends)
+
+    def compile(self) -> Matcher:
+        def match(x: Cursor) -> Tuple[()] | List[Warn] | None:
+            if (end := self.longest(x.tokens, x.pos)) is not None:
+                x.pos = end
+                return ()
+            if x.pos < len(x.tokens) and self.first_words:
+                first = x.tokens[x.pos].lower
+                if first not in self.first_words and self.first_words.isdisjoint(
+                    keywords.near(first)
+                ):
+                    return None  # as every option would
+            return self.match(x)
+
+        return memoized(self.memo_key(), match)
+
+    def memo_key(self) -> Hashable:
+        return Literal, tuple(map(tuple, self.options))
+
     def __repr__(self) -> str:
         return f"Literal({self.expr_group.expr_options})"
 
 
 class Num(Expr1[int]):
-    def match(self, x: Deque[str]) -> Tuple[int] | List[Warn] | None:
-        if almost_number(x[0]):
-            res = x.popleft()
+    memoize = False
+
+    def match(self, x: Cursor) -> Tuple[int] | List[Warn] | None:
+        if x[0].kind == TokenKind.NUMBER:
+            return (int(x.popleft().text),)
+        if almost_number(x[0].text):
+            res = x.popleft().text
             return [Warn(f"Expected number; got `{res}`.")]
-        return (int(val),) if x and x[0].isnumeric() and (val := x.popleft()) else None
+        return None
 
     def __repr__(self) -> str:
         return "Num"
 
 
 class DurationExpr(Expr1[dt]):
-    def match(self, x: Deque[str]) -> Tuple[dt] | List[Warn] | None:
+    time_relative = True
+
+    def match(self, x: Cursor) -> Tuple[dt] | List[Warn] | None:
         """
-        Gets the longest prefix possible that matches a duration.
+        Gets the longest prefix possible that matches a duration. Tokens are fed to
+        one DurationParser, so each is scanned once however long the prefix gets.
         """
-        best = -1, now()
-        curr = ""
+        curr_time = now()
+        best = -1, curr_time
+        parser = DurationParser(curr_time)
+        results: List[dt | str] = []  # parse_duration of the first i + 1 tokens
         last_fail = False
-        curr_time = best[1]
         for i in range(min(len(x), 16)):
-            curr += x[i]
-            if isinstance(duration := parse_duration(curr, curr_time), str):
+            results.append(duration := parser.feed(x[i].text).result())
+            if isinstance(duration, str):
                 if last_fail:
                     break
                 last_fail = True
             else:
                 last_fail = False
-                best = max(best, (i, duration))
+                best = i, duration
 
         if best[0] == -1:
-            first = x.popleft()
+            first = x.popleft().text
             if not first[0].isnumeric():
                 return None
             if not first.isnumeric():  # this maybe has units; try to parse them
-                return [Warn(parse_duration(first, curr_time))]
+                return [Warn(results[0])]
             # first is definitely a number now
             if not len(x):
                 return [Warn(f"Didn't find a time unit after `{first}`")]
             # at least two tokens, first one is a number, second should've be a unit
             # (or more), however this must've failed as best is -1
-            return [Warn(parse_duration(first + x.popleft(), curr_time))]
-
-        for _ in range(best[0] + 1):  # consumed tokens
             x.popleft()
+            return [Warn(results[1])]
+
+        x.pos += best[0] + 1  # consumed tokens
         return (best[1],)
 
     def __repr__(self) -> str:
@@ -397,12 +691,15 @@ class DurationExpr(Expr1[dt]):
 
 
 class TimeExpr(Expr1[Time]):
-    def match(self, x: Deque[str]) -> Tuple[Time] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[Time] | List[Warn] | None:
         """
         Extracts a time from the message.
         Valid format examples: 4pm, 4 pm, 420pm, 420 pm, 4:20pm, 4:20 pm
         """
-        first = x.popleft()
+        if x[0].kind in (TokenKind.WORD, TokenKind.WEEKDAY, TokenKind.AM_PM):
+            x.popleft()
+            return None
+        first = x.popleft().text
         if sum(1 for c in first if c == ":") > 1:
             return None
         first = first.replace(":", "")
@@ -413,7 +710,7 @@ class TimeExpr(Expr1[Time]):
             num = first
             if not x:
                 return [Warn("Ran out of tokens while parsing.")]
-            time_sig = x.popleft().lower()  # am/pm
+            time_sig = x.popleft().lower  # am/pm
         else:
             if len(first) < 3:
                 return None
@@ -452,15 +749,7 @@ class WeeklyTimeExpr(Expr2[Time, str]):
     """
 
     def __init__(self) -> None:
-        days = {
-            "monday",
-            "tuesday",
-            "wednesday",
-            "thursday",
-            "friday",
-            "saturday",
-            "sunday",
-        }
+        days = weekdays
         self.expr_group = ExprGroup[str](
             list(
                 chain.from_iterable(
@@ -474,7 +763,7 @@ class WeeklyTimeExpr(Expr2[Time, str]):
             [day for day in days for _ in range(2)],
         )
 
-    def match(self, x: Deque[str]) -> Tuple[Time, str] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[Time, str] | List[Warn] | None:
         if len(x) == 1:
             return [Warn("Ran out of tokens while parsing.")]
         res, day = self.expr_group.match(x)
@@ -487,19 +776,15 @@ class WeeklyTimeExpr(Expr2[Time, str]):
 
 
 class SuffixedNumExpr(Expr1[int]):
-    def match(self, x: Deque[str]) -> Tuple[int] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[int] | List[Warn] | None:
         """
         Matches either a normal number or something like "3rd"
         """
-        if x[0].isnumeric():
-            return (int(x.popleft()),)
-        if (
-            len(x[0]) < 3
-            or not x[0][:-2].isnumeric()
-            or x[0][-2:] not in ("st", "nd", "rd", "th")
-        ):
+        if x[0].kind == TokenKind.NUMBER:
+            return (int(x.popleft().text),)
+        if x[0].kind != TokenKind.ORDINAL:
             return None
-        return (int(x.popleft()[:-2]),)
+        return (int(x.popleft().text[:-2]),)
 
     def __repr__(self) -> str:
         return "IndexedNum"
@@ -514,7 +799,7 @@ class MonthlyTimeExpr(Expr2[Time, int]):
             ],
         )
 
-    def match(self, x: Deque[str]) -> Tuple[Time, int] | List[Warn] | None:
+    def match(self, x: Cursor) -> Tuple[Time, int] | List[Warn] | None:
         """
         Gets a day and time of the month from an expression.
         Valid examples: 8AM 2nd, 3rd 9:21PM.
@@ -531,6 +816,8 @@ class MonthlyTimeExpr(Expr2[Time, int]):
 
 
 class TimeZoneExpr(Expr1[BaseTzInfo]):
+    time_relative = True
+
     most_common = [
         "US/Alaska",
         "US/Arizona",
@@ -561,80 +848,37 @@ class TimeZoneExpr(Expr1[BaseTzInfo]):
         "UTC",
     ]
 
-    def match(self, x: Deque[str]) -> Tuple[BaseTzInfo] | List[Warn] | None:
-        best: Tuple[float, Optional[BaseTzInfo]] = 10**20, None
-        if x[0].startswith("UTC"):
-            tz_str = x.popleft()
+    index = OffsetIndex((*most_common, *pytz.common_timezones))
+
+    def match(self, x: Cursor) -> Tuple[BaseTzInfo] | List[Warn] | None:
+        start = x.pos
+        if x[0].text.startswith("UTC"):
+            tz_str = x.popleft().text
             try:
                 offset = int(tz_str[3:])
             except TypeError:
                 return [Warn(f"Could not parse offset {tz_str[3:]}.")]
-            else:
-                utc_now = pytz.utc.localize(now())
-
-                def _check(
-                    best: Tuple[float, Optional[BaseTzInfo]], tz_name: str
-                ) -> Tuple[float, Optional[BaseTzInfo]]:
-                    timezone = pytz.timezone(tz_name)
-                    local_now = timezone.localize(utc_now.replace(tzinfo=None))
-                    # utc - offset = local
-                    # utc - local = offset
-                    return min(
-                        best,
-                        (
-                            abs(
-                                (utc_now - local_now).total_seconds()
-                                - (offset * 60 * 60)
-                            ),
-                            timezone,
-                        ),
-                        key=lambda x: x[0],
-                    )
-
-                for tz_name in (*TimeZoneExpr.most_common, *pytz.common_timezones):
-                    best = _check(best, tz_name)
-                    if best[0] < 20 * 60:
-                        break
-                return (
-                    [Warn("Did not find any matching timezones.")]
-                    if best[1] is None
-                    else (best[1],)
-                )
-        elif isinstance(res := TimeExpr().match(xc := deque(x)), (tuple, list)):
-            for _ in range(len(x) - len(xc)):
-                x.popleft()
-            if isinstance(res, tuple):
-                _curr_time = res[0]
-                utc_now = utc.localize(now())
-                curr_time = replace_down(utc_now, "hour", _curr_time)
-
-                def _check(
-                    best: Tuple[float, Optional[BaseTzInfo]], tz_name: str
-                ) -> Tuple[float, Optional[BaseTzInfo]]:
-                    timezone = pytz.timezone(tz_name)
-                    user_tz_guess = timezone.localize(curr_time.replace(tzinfo=None))
-                    res = abs((user_tz_guess - utc_now).total_seconds()) % 86400
-                    return min(
-                        best,
-                        (res, timezone),
-                        key=lambda x: x[0],
-                    )
-
-                for tz_name in (*TimeZoneExpr.most_common, *pytz.common_timezones):
-                    best = _check(best, tz_name)
-                    if best[0] < 20 * 60:
-                        break
-
-                return (
-                    [Warn("Did not find any matching timezones.")]
-                    if best[1] is None
-                    else (best[1],)
+            best = TimeZoneExpr.index.closest(
+                now(), lambda off: abs(off.total_seconds() - (offset * 60 * 60))
+            )
+        elif isinstance(res := TimeExpr().match(x), (tuple, list)):
+            if isinstance(res, list):
+                return res
+            utc_now = utc.localize(now())
+            # the time they gave on the current UTC date; whole days are ignored below
+            wall = replace_down(utc_now, "hour", res[0]).replace(tzinfo=None)
+            best = TimeZoneExpr.index.closest(
+                wall,
+                lambda off: abs(
+                    (wall - off - utc_now.replace(tzinfo=None)).total_seconds()
                 )
-            return res
+                % 86400,
+            )
         else:  # this is a region name
+            x.pos = start
             tz_str = ""
             try:
-                return (pytz.timezone(tz_str := x.popleft()),)
+                return (pytz.timezone(tz_str := x.popleft().text),)
             except Exception:
                 return [
                     Warn(
@@ -643,6 +887,9 @@ class TimeZoneExpr(Expr1[BaseTzInfo]):
                         '"US/Eastern", or try providing your local time or UTC offset.'
                     )
                 ]
+        if best is None:
+            return [Warn("Did not find any matching timezones.")]
+        return (best,)
 
     def __repr__(self) -> str:
         return "TimeZone"
@@ -658,10 +905,15 @@ class _SlashedDateExpr(Expr1[relativedelta]):
     def __init__(self, year: bool) -> None:
         self.year = year
 
-    def match(self, x: Deque[str]) -> Tuple[relativedelta] | List[Warn] | None:
-        if sum(1 for c in x[0] if c == "/") != 2 + self.year:
+    def memo_key(self) -> Hashable:
+        return _SlashedDateExpr, self.year
+
+    def match(self, x: Cursor) -> Tuple[relativedelta] | List[Warn] | None:
+        if x[0].kind != TokenKind.DATE:
+            return None
+        if sum(1 for c in x[0].text if c == "/") != 2 + self.year:
             return None
-        date = x.popleft()
+        date = x.popleft().text
         if not all(x.isnumeric() for x in date.split("/")):
             return None
         month, day = map(int, date.split("/")[:2])
@@ -716,7 +968,7 @@ class DateExpr(Expr2[relativedelta, relativedelta | None]):
         )
 
     def match(
-        self, x: Deque[str]
+        self, x: Cursor
     ) -> Tuple[relativedelta, relativedelta | None] | List[Warn] | None:
         res, date_expr_type = self.expr_group.match(x)
         if isinstance(res, tuple):
@@ -798,7 +1050,7 @@ class DateTimeExpr(Expr3[Time, relativedelta, relativedelta]):
         )
 
     def match(
-        self, x: Deque[str]
+        self, x: Cursor
     ) -> Tuple[Time, relativedelta, relativedelta] | List[Warn] | None:
         res, _ = self.expr_group.match(x)
         if isinstance(res, tuple):
@@ -806,23 +1058,43 @@ class DateTimeExpr(Expr3[Time, relativedelta, relativedelta]):
                 return (res[0], relativedelta(), relativedelta(days=1))
             if not isinstance(res[0], Time):  # (rd, rd, Time)
                 res = res[2], res[0], res[1]
-        return cast(
-            Tuple[Time, relativedelta, relativedelta] | List[Warn] | None, res
-        )
+        return cast(Tuple[Time, relativedelta, relativedelta] | List[Warn] | None, res)
 
 
 class KleeneStar(Expr1[str]):
-    def match(self, x: Deque[str]) -> Tuple[str] | List[Warn] | None:
-        res = x.popleft()
+    memoize = False
+
+    def match(self, x: Cursor) -> Tuple[str] | List[Warn] | None:
+        res = x.popleft().text
         while x:
-            res += " " + x.popleft()
+            res += " " + x.popleft().text
         return (res,)
 
     def __repr__(self) -> str:
         return "KleeneStar"
 
 
+class _TrieNode:
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode] = {}
+        self.commands: List[int] = []  # commands whose leading Literal ends here
+
+
 class ArgParser:
+    """
+    Commands are indexed by the words of their leading Literal. A message is first
+    parsed only by the commands its leading words spell out; if none of them
+    succeeds, the commands whose first word is a typo away are tried as well, since
+    one of those may give the better warning. Every other command would return None,
+    so the result is the same as parsing with all of them.
+
+    The last `cache_size` messages parsed are kept by their tokens, along with which
+    command they parsed to. Only time relative exprs (a duration, a timezone) change
+    with the time, so on a repeat just those are matched again where they were the
+    first time, in the command that was picked and in every other one tried. The
+    parse still holds if they match the same tokens, or fail again.
+    """
+
     def __init__(
         self,
         *commands: Command[()]
@@ -830,11 +1102,118 @@ class ArgParser:
         | Command[Any, Any]
         | Command[Any, Any, Any]
         | Command[Any, Any, Any, Any],
+        cache_size: int = 1024,
+        log_every: int = 1000,
     ) -> None:
         self.commands = list(commands)
+        self.cache_size = cache_size
+        self.log_every = log_every  # messages between logging the hit rate, 0 never
+        self.cache: OrderedDict[Tokens, Tuple[int, Any, Dict[int, List[Stamp]]]]
+        self.cache = OrderedDict()  # tokens -> (command, res, stamps by command)
+        self.hits = self.misses = 0
+        for command in self.commands:
+            command.compile()
+        self.trie = _TrieNode()
+        self.first_words: DefaultDict[str, Set[int]] = defaultdict(set)
+        self.unindexed: List[int] = []  # commands not starting with a Literal
+        for i, command in enumerate(self.commands):
+            if not command.exprs or not isinstance(command.exprs[0], Literal):
+                self.unindexed.append(i)
+                continue
+            for words in command.exprs[0].options:
+                node = self.trie
+                for word in words:
+                    node = node.children.setdefault(word, _TrieNode())
+                node.commands.append(i)
+                self.first_words[words[0]].add(i)
 
     def parse_message(self, msg: str) -> ParsedCommand:
-        return min(
-            (command.parse(msg) for command in self.commands),
-            key=lambda parsed_command: res_key(parsed_command.res),
+        tokens = lex(msg)
+        parsed = self.cached(tokens)
+        self.count(parsed is not None)
+        if parsed is not None:
+            return parsed
+        memo: Memo = {}
+        tried: Dict[int, ParsedCommand] = {}
+        i, parsed = self.dispatch(tokens, memo, tried)
+        stamps: Dict[int, List[Stamp]] = {}
+        for j in tried:
+            if self.commands[j].time_relative:
+                stamps[j] = self.commands[j].stamps(tokens, memo)
+        self.cache[tokens] = i, parsed.res, stamps
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return parsed
+
+    def cached(self, tokens: Tokens) -> Optional[ParsedCommand]:
+        """The cached parse of `tokens` as of now, None if it isn't (still) valid."""
+        if (entry := self.cache.get(tokens)) is None:
+            return None
+        i, res, stamps = entry
+        args = list(res) if isinstance(res, tuple) else []
+        for j, command_stamps in stamps.items():
+            for arg, expr, start, end, matched in command_stamps:
+                x = Cursor(tokens, start)
+                curr = expr.match(x)
+                if isinstance(curr, tuple) != matched or matched and x.pos != end:
+                    return None
+                if j == i and args and isinstance(curr, tuple):
+                    args[arg : arg + len(curr)] = curr
+        if isinstance(res, tuple):
+            res = tuple(args)
+        elif isinstance(res, list):
+            res = list(res)
+        self.cache.move_to_end(tokens)
+        return ParsedCommand(self.commands[i].f, self.commands[i].needs_tz, res)
+
+    def count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.log_every and (total := self.hits + self.misses) % self.log_every == 0:
+            green(f"Parse cache hit rate: {self.hit_rate():.1%} of {total} messages")
+
+    def hit_rate(self) -> float:
+        """The share of parse_message calls answered from the cache."""
+        return self.hits / (self.hits + self.misses or 1)
+
+    def dispatch(
+        self, tokens: Tokens, memo: Memo, parsed: Dict[int, ParsedCommand]
+    ) -> Tuple[int, ParsedCommand]:
+        """The best command and its parse; `parsed` gets every command tried."""
+        candidates = set(self.unindexed)
+        node = self.trie
+        for token in tokens:
+            if (child := node.children.get(token.lower)) is None:
+                break
+            node = child
+            candidates.update(node.commands)
+        i, best = self.best(tokens, memo, candidates, parsed)
+        if isinstance(best.res, tuple):
+            return i, best
+
+        first = tokens[0].lower
+        for word in keywords.near(first) | {first}:
+            candidates |= self.first_words.get(word, set())
+        return self.best(tokens, memo, candidates, parsed)
+
+    def best(
+        self,
+        msg: Tokens,
+        memo: Memo,
+        candidates: Set[int],
+        parsed: Dict[int, ParsedCommand],
+    ) -> Tuple[int, ParsedCommand]:
+        """The first best result in registration order, parsing what's missing."""
+        for i in sorted(candidates - parsed.keys()):
+            parsed[i] = self.commands[i].parse(msg, memo)
+        best = min(
+            sorted(candidates),
+            key=lambda i: res_key(parsed[i].res),
+            default=None,
         )
+        if best is None or parsed[best].res is None:  # so did every other command
+            first = self.commands[0]
+            return 0, ParsedCommand(first.f, first.needs_tz, None)
+        return best, parsed[best]
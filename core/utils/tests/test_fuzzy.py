@@ -0,0 +1,45 @@
+from core.utils.fuzzy import FuzzyIndex, deletes, distance
+from core.utils.parse import keywords
+from disc.tests.main import Test
+
+
+class TestFuzzy(Test):
+    async def test_near(self) -> None:
+        import core.command_processor  # noqa: F401  registers the grammar's words
+
+        self.assert_true({"tuesday", "reminder", "wakeup"} <= keywords.words)
+        queries = {
+            edited
+            for word in keywords.words
+            for edited in deletes(word, 2)
+            | {word[:i] + "x" + word[i:] for i in range(len(word) + 1)}
+            | {
+                word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+                for i in range(len(word) - 1)
+            }
+        }
+        for query in [*queries, "", "a", "zzzzzzzzzzzz"]:
+            n = 2 if len(query) >= keywords.long_word else 1
+            self.assert_equal(
+                [query, keywords.near(query)],
+                [
+                    query,
+                    frozenset(w for w in keywords.words if 0 < distance(query, w) <= n),
+                ],
+            )
+
+    async def test_suggest(self) -> None:
+        index = FuzzyIndex()
+        for word in ("monday", "sunday", "tuesday", "today", "tomorrow"):
+            index.add(word)
+        self.assert_equal(index.suggest("tusday"), ["tuesday", "sunday", "today"])
+        self.assert_equal(index.suggest("tusday", 1), ["tuesday"])
+        self.assert_equal(index.suggest("tday"), ["today"])
+        self.assert_equal(index.suggest("monday"), ["sunday", "today"])
+        self.assert_equal(distance("tomorow", "tomorrow"), 1)
+        self.assert_equal(distance("ab", "ba"), 1)
+        # two edits count as a typo for long words only
+        self.assert_equal(index.near("tomorow"), {"tomorrow"})
+        self.assert_equal(index.near("tusday"), {"tuesday"})
+        self.assert_equal(index.near("tmorow"), set())
+        self.assert_equal(index.near("tommorrw"), {"tomorrow"})
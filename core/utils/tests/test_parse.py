@@ -0,0 +1,128 @@
+from datetime import datetime as dt
+from typing import List
+from unittest.mock import patch
+
+from disc.tests.corpus import corpus, parse_all
+from core.command_processor import CommandProcessor
+from core.timer import now
+from core.utils.parse import (
+    Cursor,
+    Literal,
+    ParsedCommand,
+    TimeExpr,
+    TokenKind,
+    lex,
+)
+from disc.tests.main import Test
+
+
+def summary(parsed: ParsedCommand) -> List[object]:
+    return [parsed.f.__name__, parsed.needs_tz, parsed.res]
+
+
+class TestParse(Test):
+    async def test_dispatch(self) -> None:
+        now.set_speed(0)
+        parser = CommandProcessor().arg_parser
+        for msg in corpus:
+            self.assert_equal(
+                [msg, *summary(parser.parse_message(msg))],
+                [msg, *summary(parse_all(parser, msg))],
+            )
+
+    async def test_compiled(self) -> None:
+        now.set_speed(0)
+        parser = CommandProcessor().arg_parser
+        for command in parser.commands:
+            for msg in corpus:
+                self.assert_equal(
+                    [msg, command, summary(command.parse(msg))],
+                    [msg, command, summary(command.interpret(msg))],
+                )
+
+    async def test_memo(self) -> None:
+        with patch.object(
+            TimeExpr, "match", autospec=True, side_effect=TimeExpr.match
+        ) as match:
+            parser = CommandProcessor().arg_parser
+            parsed = parser.parse_message("weekly monday 9:30pm call mom")
+        self.assert_equal(parsed.f.__name__, "set_weekly")
+        # once where "monday" is and once after it, not once per weekday option
+        self.assert_equal(match.call_count, 2)
+
+    async def test_cache(self) -> None:
+        now.set_speed(0)
+        now.suppose_it_is(dt(2024, 3, 9, 12))
+        parser = CommandProcessor().arg_parser
+        for msg in corpus:
+            parser.parse_message(msg)
+        # US clocks have moved forward since, so offsets changed as well as durations
+        now.suppose_it_is(dt(2024, 3, 10, 12, 30))
+        for msg in corpus:
+            self.assert_equal(
+                [msg, *summary(parser.parse_message(msg))],
+                [msg, *summary(parse_all(parser, msg))],
+            )
+        cached = [msg for msg in corpus if lex(msg) in parser.cache]
+        self.assert_equal(parser.hits, len(cached))
+        self.assert_equal(parser.hit_rate(), len(cached) / (2 * len(corpus)))
+        # failures are kept too, with what the commands that read the clock matched
+        self.assert_equal(cached, corpus)
+
+        # the duration after "in" fails to match again, so the repeat is a hit
+        parser.hits = parser.misses = 0
+        for msg in ("in 6 minuts nap", "in 6 minuts nap", "in 6 minutes"):
+            parser.parse_message(msg)
+        self.assert_equal([parser.hits, parser.misses], [1, 2])
+
+        parser.cache_size = 2
+        for msg in ("in 7 minutes", "see tasks", "daily 9am run"):
+            parser.parse_message(msg)
+        self.assert_equal(list(parser.cache), [lex("see tasks"), lex("daily 9am run")])
+
+    async def test_literal(self) -> None:
+        literal = Literal(("wake up", "wakeup"), ("now", "right now"), "please")
+        compiled = literal.compile()
+        for msg in (
+            "wake up now please",
+            "wakeup right now please extra",
+            "WAKEUP now please",
+            "wake",
+            "wakeup right",
+            "wkeup now please",
+            "wake up rihgt now pleas",
+            "sleep now please",
+            "",
+        ):
+            tokens = lex(msg)
+            expected, actual = Cursor(tokens), Cursor(tokens)
+            self.assert_equal(
+                [msg, compiled(actual), actual.pos],
+                [msg, literal.match(expected), expected.pos],
+            )
+        # two edits still read as a typo of a long word, but not of a short one
+        literal = Literal("wakeup disable")
+        self.assert_equal(
+            literal.match(Cursor(lex("wakeup dsiabel"))),
+            ["Did you mean `disable` instead of `dsiabel`?"],
+        )
+        self.assert_equal(literal.match(Cursor(lex("wakeup dsabel"))), None)
+
+    async def test_lex(self) -> None:
+        tokens = lex("on  9/12 at 4:20PM pm 3rd 12 1h30m Monday 4pm")
+        self.assert_equal(
+            [(token.text, token.kind) for token in tokens],
+            [
+                ("on", TokenKind.WORD),
+                ("9/12", TokenKind.DATE),
+                ("at", TokenKind.WORD),
+                ("4:20PM", TokenKind.CLOCK),
+                ("pm", TokenKind.AM_PM),
+                ("3rd", TokenKind.ORDINAL),
+                ("12", TokenKind.NUMBER),
+                ("1h30m", TokenKind.DURATION),
+                ("Monday", TokenKind.WEEKDAY),
+                ("4pm", TokenKind.CLOCK),
+            ],
+        )
+        self.assert_equal(tokens[8].lower, "monday")
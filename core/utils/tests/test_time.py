@@ -1,8 +1,10 @@
-from datetime import datetime as dt, time as Time
+from datetime import datetime as dt, time as Time, timedelta
+from typing import Callable, Optional
 
 import pytz
+from pytz import BaseTzInfo
 from disc.tests.main import Test
-from core.utils.time import parse_duration, parse_time
+from core.utils.time import DurationParser, OffsetIndex, parse_duration, parse_time
 
 
 class TestTimeUtils(Test):
@@ -26,6 +28,34 @@ class TestTimeUtils(Test):
             "`g` is not a valid unit of time.",
         )
 
+    async def test_duration_parser(self) -> None:
+        ref = dt(year=2023, month=1, day=1)
+        for pieces in (
+            ["1", "h", "30", "min"],
+            ["2", "weeks", "3", "d"],
+            ["5", "m", "x"],
+            ["5", "minu", "tes"],
+            ["5m", ":", "3s"],
+            ["1y", "1n", "1d"],
+        ):
+            parser, prefix = DurationParser(ref), ""
+            for piece in pieces:
+                prefix += piece
+                self.assert_equal(
+                    parser.feed(piece).result(), parse_duration(prefix, ref)
+                )
+        self.assert_equal(
+            parse_duration("5m:3s", ref),
+            "Didn't find a numerical value at character :.",
+        )
+        self.assert_equal(
+            parse_duration("5minu", ref), "`minu` is not a valid unit of time."
+        )
+        self.assert_equal(
+            parse_duration("5 m", ref),
+            "Didn't find a time unit corresponding to the value `5`.",
+        )
+
     async def test_parse_time(self) -> None:
         est = pytz.timezone("US/Eastern")
         self.assert_is_instance(parse_time("1:48pm", est), Time)
@@ -34,3 +64,54 @@ class TestTimeUtils(Test):
 
         self.assert_is_instance(parse_time("111:48pm", est), str)
         self.assert_is_instance(parse_time(":428pm", est), str)
+
+    async def test_offset_index(self) -> None:
+        names = ("US/Eastern", "Asia/Kolkata", "Europe/London", *pytz.common_timezones)
+        index = OffsetIndex(names)
+
+        def scan(
+            wall: dt, distance: Callable[[timedelta], float]
+        ) -> Optional[BaseTzInfo]:
+            best: Optional[BaseTzInfo] = None
+            for name in names:
+                zone = pytz.timezone(name)
+                d = distance(zone.localize(wall).utcoffset())  # type: ignore
+                if best is None or d < distance(
+                    best.localize(wall).utcoffset()  # type: ignore
+                ):
+                    best = zone
+                if d < 20 * 60:
+                    break
+            return best
+
+        # around the US and EU spring transitions, and a quiet day
+        for wall in (
+            dt(2024, 3, 10, 1, 59),
+            dt(2024, 3, 10, 2, 30),
+            dt(2024, 3, 10, 3, 0),
+            dt(2024, 3, 31, 0, 30),
+            dt(2024, 3, 31, 1, 30),
+            dt(2024, 7, 1, 12),
+            dt(2024, 7, 1, 18),
+        ):
+            for hours in (-10, -5, -4, 0, 1, 5, 5.5, 13, 15):
+                self.assert_equal(
+                    [
+                        wall,
+                        hours,
+                        index.closest(
+                            wall, lambda off: abs(off.total_seconds() - hours * 3600)
+                        ),
+                    ],
+                    [
+                        wall,
+                        hours,
+                        scan(wall, lambda off: abs(off.total_seconds() - hours * 3600)),
+                    ],
+                )
+        self.assert_true(len(index.spans) <= 4)
+        start, end = index.stable_span(dt(2024, 7, 1, 12))
+        self.assert_true(start <= dt(2024, 7, 1) and end >= dt(2024, 7, 2))
+        self.assert_equal(
+            index.stable_span(dt(2024, 3, 10, 2, 30)), (dt(2024, 3, 10, 2, 30),) * 2
+        )
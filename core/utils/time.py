@@ -1,8 +1,13 @@
+from bisect import bisect
 from datetime import datetime as dt, time as Time, timedelta
+from functools import cached_property
 from typing import (
+    Callable,
     Dict,
+    List,
     Literal,
     Optional,
+    Sequence,
     Tuple,
     TypeVar,
     Union,
@@ -14,6 +19,78 @@ from pytz.tzinfo import BaseTzInfo
 from core.timer import now
 
 
+unit_seconds = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 86400 * 7}
+unit_aliases: Dict[str, Tuple[str, ...]] = {
+    "s": ("second", "sec"),
+    "m": ("minute", "min"),
+    "h": ("hour", "hr"),
+    "d": ("day",),
+    "w": ("week", "wk"),
+    "n": ("month",),
+    "y": ("year", "yr"),
+}
+units = {
+    alias + plur: one_char
+    for one_char, aliases in unit_aliases.items()
+    for alias in aliases
+    for plur in ("", "s")
+}
+units.update({k: k for k in unit_aliases.keys()})
+
+
+class DurationParser:
+    """
+    parse_duration over a string that arrives in pieces: `feed` only scans the new
+    characters, and `result` is what parse_duration returns for everything fed so
+    far. Parsing each prefix of a message is then linear rather than quadratic.
+    """
+
+    def __init__(self, curr_time: dt) -> None:
+        self.time = curr_time  # plus every value and unit read so far
+        self.error: Optional[str] = None  # one no further input can fix
+        self.value: Optional[int] = None  # being read, along with its unit
+        self.unit = ""
+
+    def feed(self, duration_string: str) -> "DurationParser":
+        for c in duration_string:
+            if self.error is not None:
+                break
+            if self.value is not None:
+                if c.isnumeric() and not self.unit:
+                    self.value = 10 * self.value + int(c)
+                    continue
+                if c.isalpha():
+                    self.unit += c
+                    continue
+                if isinstance(res := self.pending(), str):
+                    self.error = res
+                    break
+                self.time, self.value, self.unit = res, None, ""
+            if c.isspace():
+                continue
+            if not c.isnumeric():
+                self.error = f"Didn't find a numerical value at character {c}."
+                break
+            self.value = int(c)
+        return self
+
+    def pending(self) -> Union[dt, str]:
+        """`time` plus the value being read, if its unit is complete and valid."""
+        if not self.unit:
+            return f"Didn't find a time unit corresponding to the value `{self.value}`."
+        if self.unit not in units:
+            return f"`{self.unit}` is not a valid unit of time."
+        unit, value = units[self.unit], cast(int, self.value)
+        if unit in unit_seconds:
+            return self.time + timedelta(seconds=value) * unit_seconds[unit]
+        return self.time + relativedelta(months=value * (12 if unit == "y" else 1))
+
+    def result(self) -> Union[dt, str]:
+        if self.error is not None:
+            return self.error
+        return self.time if self.value is None else self.pending()
+
+
 def parse_duration(
     duration_string: str,
     curr_time: dt,
@@ -21,57 +98,81 @@ def parse_duration(
     """
     Takes in a UTC time and returns that time plus the duration in question.
     """
-    ptr = 0
-    time_map = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 86400 * 7}
-    inv_alias_map: Dict[str, Tuple[str, ...]] = {
-        "s": ("second", "sec"),
-        "m": ("minute", "min"),
-        "h": ("hour", "hr"),
-        "d": ("day",),
-        "w": ("week", "wk"),
-        "n": ("month",),
-        "y": ("year", "yr"),
-    }
-    alias_map = {
-        alias + plur: one_char
-        for one_char, aliases in inv_alias_map.items()
-        for alias in aliases
-        for plur in ("", "s")
-    }
-    alias_map.update({k: k for k in inv_alias_map.keys()})
-
-    while ptr < len(duration_string):
-        if duration_string[ptr].isspace():
-            ptr += 1
-            continue
-
-        cur = 0
-        any_num = False
-        while ptr < len(duration_string) and duration_string[ptr].isnumeric():
-            cur = 10 * cur + int(duration_string[ptr])
-            ptr += 1
-            any_num = True
-
-        if not any_num:
-            return f"Didn't find a numerical value at character {duration_string[ptr]}."
-
-        unit = ""
-        while ptr < len(duration_string) and duration_string[ptr].isalpha():
-            unit += duration_string[ptr]
-            ptr += 1
-
-        if not unit:
-            return f"Didn't find a time unit corresponding to the value `{cur}`."
-        if unit not in alias_map:
-            return f"`{unit}` is not a valid unit of time."
-
-        unit = alias_map[unit]
-
-        if unit in time_map:
-            curr_time += timedelta(seconds=cur) * time_map[unit]
-        else:
-            curr_time += relativedelta(months=cur * (12 if unit == "y" else 1))
-    return curr_time
+    return DurationParser(curr_time).feed(duration_string).result()
+
+
+class OffsetIndex:
+    """
+    The zones in `names` by the UTC offset they give a wall-clock time when it's
+    localized there, keeping the first zone in order for each offset. An index holds
+    until that time crosses an offset change (DST or otherwise) in one of the zones,
+    so guessing a zone from an offset looks at a few dozen distinct offsets instead
+    of localizing in hundreds of zones.
+    """
+
+    def __init__(self, names: Sequence[str]) -> None:
+        self.names = names
+        # (from, until, offset -> (rank, zone)) for recently used wall times
+        self.spans: List[Tuple[dt, dt, Dict[timedelta, Tuple[int, BaseTzInfo]]]] = []
+
+    @cached_property
+    def zones(self) -> List[BaseTzInfo]:
+        return [pytz.timezone(name) for name in self.names]
+
+    def offsets(self, wall: dt) -> Dict[timedelta, Tuple[int, BaseTzInfo]]:
+        for start, end, offsets in self.spans:
+            if start <= wall < end:
+                return offsets
+        offsets = {}
+        for rank, zone in enumerate(self.zones):
+            offsets.setdefault(
+                cast(timedelta, zone.localize(wall).utcoffset()), (rank, zone)
+            )
+        self.spans = [*self.spans[-3:], (*self.stable_span(wall), offsets)]
+        return offsets
+
+    def stable_span(self, wall: dt) -> Tuple[dt, dt]:
+        """Wall times around `wall` that every zone localizes with the same offset."""
+        start, end = wall - timedelta(days=1), dt.max
+        for zone in self.zones:
+            # pytz keeps each zone's transitions as UTC times, with the offset
+            # (utcoffset, dst, name) in force from each one on
+            times = getattr(zone, "_utc_transition_times", None)
+            if not times:
+                continue
+            info = getattr(zone, "_transition_info")
+            for k in range(max(bisect(times, wall - timedelta(days=2)), 1), len(times)):
+                before, after = info[k - 1][0], info[k][0]
+                # wall times between these localize to either offset
+                first = times[k] + min(before, after)
+                last = times[k] + max(before, after)
+                if last <= wall:
+                    start = max(start, last)
+                elif first > wall:
+                    end = min(end, first)
+                    break
+                else:
+                    return wall, wall
+        return start, end
+
+    def closest(
+        self, wall: dt, distance: Callable[[timedelta], float]
+    ) -> Optional[BaseTzInfo]:
+        """
+        The first zone whose offset at `wall` is less than 20 minutes away by
+        `distance`, else the first of the closest ones: what trying every zone in
+        order would find.
+        """
+        offsets = self.offsets(wall)
+        if close := [
+            ranked for off, ranked in offsets.items() if distance(off) < 20 * 60
+        ]:
+            return min(close)[1]
+        if not offsets:
+            return None
+        return min(offsets.items(), key=lambda item: (distance(item[0]), item[1][0]))[
+            1
+        ][1]
 
 
 def parse_time(time_string: str, timezone: BaseTzInfo) -> Union[Time, str]:
@@ -1,4 +1,5 @@
-from typing import Any, Protocol
+from threading import RLock
+from typing import Any, List, Protocol
 
 
 class Color(Protocol):
@@ -18,3 +19,28 @@ class Str_able(Protocol):
 
 class Writable(Protocol):
     __tablename__: str
+
+
+class StorageBackend(Protocol):
+    # held around every call, as sessions usually aren't thread safe
+    lock: RLock
+
+    def add(self, obj: Any) -> None:
+        ...
+
+    def delete(self, obj: Any) -> None:
+        ...
+
+    def replace(self, old: Any, new: Any) -> None:
+        """Stores `new` in place of `old`, keeping its primary key."""
+        ...
+
+    def commit(self) -> None:
+        ...
+
+    def load(self, cls: type) -> List[Any]:
+        ...
+
+    def range(self, cls: type, key: str, start: float, end: float) -> List[Any]:
+        """Everything of type `cls` with `start <= key < end`."""
+        ...
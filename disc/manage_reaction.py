@@ -11,7 +11,7 @@ async def manage_reaction(reaction: Reaction, user: Union[User, Member]):
     from core.start import data
 
     msg = reaction.message
-    if (alert := data.reminder_msgs.get((user.id, msg.content))) is not None:
+    if (alert := data.reminder_msgs.get(msg.id)) is not None and alert.user == user.id:
         if str(reaction.emoji) == todo_emoji:
             await msg.reply(
                 f"Got it, <@{user.id}>. Your reminder to {alert.msg} "
@@ -64,7 +64,7 @@ async def on_message(msg: Message):
 async def on_reaction_add(reaction: Reaction, user: Union[Member, User]):
     from core.start import data
 
-    if str(user.id) in reaction.message.content:
+    if reaction.message.id in data.reminder_msgs:
         await manage_reaction(reaction, user)
     elif user.id == reaction.message.author.id and str(reaction.emoji) == warning_emoji:
         async for user in reaction.users():
@@ -0,0 +1,63 @@
+"""
+Messages the parser benchmarks and tests run over: commands, typos and chatter. Also
+the reference the dispatching ArgParser has to agree with, parsing with every command.
+"""
+
+from core.utils.parse import ArgParser, ParsedCommand, res_key
+
+corpus = [
+    "help reminder",
+    "help reminders",
+    "timezone US/Eastern",
+    "timezone UTC+5",
+    "timezone 4:20pm",
+    "timezon 4:20pm",
+    "With a hey, ho",
+    "show tasks",
+    "see todos",
+    "veiw reminders",
+    "list  reminder",
+    "delete task 3",
+    "remove tasks three",
+    "delete reminders 2",
+    "delte reminder 1",
+    "exec print('hi')",
+    "todo buy milk",
+    "tasks",
+    "wakeup disable",
+    "wakeup enable",
+    "wakeup set",
+    "wakeup 8am",
+    "wakup 8am",
+    "wakeup 13pm",
+    "daily 8am wake up",
+    "daly 8am wake up",
+    "daily 8 am",
+    "daily 8",
+    "weekly 8am tuesdAy trash",
+    "weekly monday 9:30pm call mom",
+    "weekly 8am tusday trash",
+    "monthly 3rd 9:21PM rent",
+    "monthly 8AM 2nd pay",
+    "in 5 minutes stretch",
+    "in 1h30m check oven",
+    "in 5 minuts stretch",
+    "in 5",
+    "in the morning",
+    "at 4pm tomorrow leave",
+    "at 4pm on 9/12 dentist",
+    "on 9/12/2024 at 10am trip",
+    "on 5 minutes stuff",
+    "at tomorrow 9am standup",
+    "hello there",
+    "",
+    " daily 8am leading space",
+    "a",
+]
+
+
+def parse_all(parser: ArgParser, msg: str) -> ParsedCommand:
+    return min(
+        (command.interpret(msg) for command in parser.commands),
+        key=lambda parsed_command: res_key(parsed_command.res),
+    )
@@ -152,7 +152,11 @@ class MockReaction:
 
 
 class MockMessage:
+    next_id = 1
+
     def __init__(self, content: str, author: MockUser) -> None:
+        self.id = MockMessage.next_id
+        MockMessage.next_id += 1
         self.content = content
         self.author = author
         self.channel = test_channel